@@ -8,6 +8,9 @@ if __name__ == "__main__":
         "src.main:app",
         host=app_config.HOST,
         port=app_config.PORT,
-        reload=True,
+        reload=app_config.ENV == "development",
+        # "auto" memakai uvloop dan httptools bila terpasang (tidak tersedia di Windows)
+        loop="auto",
+        http="auto",
         log_level=app_config.LOG_LEVEL.lower()
     )
\ No newline at end of file
@@ -0,0 +1,30 @@
+from functools import lru_cache
+from fastapi import HTTPException
+from src.core.services.embedding_service import EmbeddingService
+from src.core.services.matching_service import MatchingService
+from src.database.firebase import FirebaseClient
+
+# Service dibuat sekali lalu dipakai ulang lintas request lewat Depends
+@lru_cache(maxsize=None)
+def _embedding_service() -> EmbeddingService:
+    return EmbeddingService()
+
+@lru_cache(maxsize=None)
+def _matching_service() -> MatchingService:
+    return MatchingService()
+
+# Dependency async agar FastAPI tidak memindahkannya ke threadpool di setiap request
+async def get_embedding_service() -> EmbeddingService:
+    return _embedding_service()
+
+async def get_matching_service() -> MatchingService:
+    return _matching_service()
+
+# Firebase client yang sudah terhubung; 503 jika koneksi gagal saat startup
+async def get_firebase_client() -> FirebaseClient:
+    firebase_client = FirebaseClient()
+    
+    if not firebase_client.is_connected():
+        raise HTTPException(status_code=503, detail="Firebase not connected")
+    
+    return firebase_client
@@ -1,25 +1,26 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from src.core.schemas.request import TextEmbeddingRequest, ImageEmbeddingRequest, HybridEmbeddingRequest
 from src.core.schemas.response import APIResponse, EmbeddingResponse
 from src.core.services.embedding_service import EmbeddingService
-from src.utils.image_processing import load_image
+from src.api.dependencies import get_embedding_service
 
 router = APIRouter(prefix="/embeddings", tags=["embeddings"])
 
 # Generate text embeddings using CLIP and Sentence Transformer models
 @router.post("/text", response_model=APIResponse)
-async def create_text_embedding(request: TextEmbeddingRequest):
+async def create_text_embedding(request: TextEmbeddingRequest, embedding_service: EmbeddingService = Depends(get_embedding_service)):
     try:
-        embedding_service = EmbeddingService()
-        
         # Get CLIP text embedding
-        clip_embedding = embedding_service.get_text_embedding_clip(
+        clip_embedding = await asyncio.to_thread(
+            embedding_service.get_text_embedding_clip,
             request.text, 
             request.item_id
         )
         
         # Get Sentence Transformer embedding
-        st_embedding = embedding_service.get_text_embedding_sentence(
+        st_embedding = await asyncio.to_thread(
+            embedding_service.get_text_embedding_sentence,
             request.text, 
             request.item_id
         )
@@ -38,16 +39,12 @@ async def create_text_embedding(request: TextEmbeddingRequest):
 
 # Generate image embedding using CLIP model
 @router.post("/image", response_model=APIResponse)
-async def create_image_embedding(request: ImageEmbeddingRequest):
+async def create_image_embedding(request: ImageEmbeddingRequest, embedding_service: EmbeddingService = Depends(get_embedding_service)):
     try:
-        embedding_service = EmbeddingService()
-        
-        # Load image
-        image = load_image(request.image_url)
-        
-        # Get image embedding
-        embedding = embedding_service.get_image_embedding(
-            image, 
+        # Download gambar dan inferensi dijalankan di thread agar event loop tidak terblokir
+        embedding = await asyncio.to_thread(
+            embedding_service.get_image_embedding_from_url,
+            request.image_url, 
             request.item_id
         )
         
@@ -64,10 +61,8 @@ async def create_image_embedding(request: ImageEmbeddingRequest):
 
 # Generate hybrid embeddings (text + optional image)
 @router.post("/hybrid", response_model=APIResponse)
-async def create_hybrid_embedding(request: HybridEmbeddingRequest):
+async def create_hybrid_embedding(request: HybridEmbeddingRequest, embedding_service: EmbeddingService = Depends(get_embedding_service)):
     try:
-        embedding_service = EmbeddingService()
-        
         # Prepare response
         response_data = {
             "text_processed": True,
@@ -76,11 +71,13 @@ async def create_hybrid_embedding(request: HybridEmbeddingRequest):
         
         # Process text
         text_embeddings = {
-            "clip_text": embedding_service.get_text_embedding_clip(
+            "clip_text": await asyncio.to_thread(
+                embedding_service.get_text_embedding_clip,
                 request.text, 
                 request.item_id
             ),
-            "sentence_text": embedding_service.get_text_embedding_sentence(
+            "sentence_text": await asyncio.to_thread(
+                embedding_service.get_text_embedding_sentence,
                 request.text, 
                 request.item_id
             )
@@ -88,9 +85,9 @@ async def create_hybrid_embedding(request: HybridEmbeddingRequest):
         
         # Process image if provided
         if request.image_url:
-            image = load_image(request.image_url)
-            image_embedding = embedding_service.get_image_embedding(
-                image, 
+            image_embedding = await asyncio.to_thread(
+                embedding_service.get_image_embedding_from_url,
+                request.image_url, 
                 request.item_id
             )
             response_data["image_processed"] = True
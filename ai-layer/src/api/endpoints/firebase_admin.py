@@ -1,11 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from datetime import datetime
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
+import traceback
+from src.config import app_config
 from src.database.firebase import FirebaseClient
-import numpy as np
+from src.api.dependencies import get_firebase_client
 
 router = APIRouter(prefix="/firebase", tags=["firebase"])
 
+# Batas penghapusan Firestore yang berjalan bersamaan saat reset koleksi
+_DELETE_CONCURRENCY = 16
+
+# Tipe yang tidak ditangani orjson secara langsung, mis. timestamp Firestore (subclass datetime)
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
 class EmbeddingData(BaseModel):
     item_id: str
     collection_name: str
@@ -13,13 +27,10 @@ class EmbeddingData(BaseModel):
     embeddings: Dict[str, List[float]]
 
 @router.post("/save", response_model=Dict)
-async def save_embedding(data: EmbeddingData):
-    firebase_client = FirebaseClient()
-    
-    if not firebase_client.is_connected():
-        raise HTTPException(status_code=503, detail="Firebase not connected")
-    
-    success = firebase_client.save_embedding(
+async def save_embedding(data: EmbeddingData, firebase_client: FirebaseClient = Depends(get_firebase_client)):
+    # Panggilan Firestore dijalankan di thread agar beberapa request bisa berjalan bersamaan
+    success = await asyncio.to_thread(
+        firebase_client.save_embedding,
         collection_name=data.collection_name,
         item_id=data.item_id,
         embeddings=data.embeddings,
@@ -32,45 +43,34 @@ async def save_embedding(data: EmbeddingData):
     return {"success": True, "message": f"Embedding saved for {data.item_id}"}
 
 @router.get("/get/{collection_name}/{item_id}", response_model=Dict)
-async def get_embedding(collection_name: str, item_id: str):
-    firebase_client = FirebaseClient()
-    
-    if not firebase_client.is_connected():
-        raise HTTPException(status_code=503, detail="Firebase not connected")
-    
+async def get_embedding(collection_name: str, item_id: str, firebase_client: FirebaseClient = Depends(get_firebase_client)):
     try:
         # Get the embedding
-        data = firebase_client.get_embedding(collection_name, item_id)
+        data = await asyncio.to_thread(firebase_client.get_embedding, collection_name, item_id)
         
         if not data:
             raise HTTPException(status_code=404, detail=f"Embedding not found for {item_id}")
         
-        # Convert numpy arrays to lists for JSON serialization
-        if 'embeddings' in data:
-            serializable_data = data.copy()
-            for key, value in data['embeddings'].items():
-                if isinstance(value, np.ndarray):
-                    serializable_data['embeddings'][key] = value.tolist()
-            return {"success": True, "data": serializable_data}
-        
-        return {"success": True, "data": data}
+        # Array numpy diserialisasi langsung oleh orjson tanpa konversi tolist()
+        return Response(
+            content=orjson.dumps({"success": True, "data": data}, option=orjson.OPT_SERIALIZE_NUMPY, default=_json_default),
+            media_type="application/json"
+        )
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        error_detail = str(e) + "\n" + traceback.format_exc()
-        print(error_detail)
-        raise HTTPException(status_code=500, detail=f"Error retrieving embedding: {str(e)}")
+        message = str(e)
+        # Traceback lengkap hanya diformat saat development
+        if app_config.ENV == "development":
+            traceback.print_exc()
+        else:
+            print(f"Error retrieving embedding: {message[:256]}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving embedding: {message}")
 
 @router.get("/list/{collection_name}", response_model=Dict)
-async def list_embeddings(collection_name: str, limit: int = 50):
-    firebase_client = FirebaseClient()
-    
-    if not firebase_client.is_connected():
-        raise HTTPException(status_code=503, detail="Firebase not connected")
-    
+async def list_embeddings(collection_name: str, limit: int = 50, firebase_client: FirebaseClient = Depends(get_firebase_client)):
     # Get embeddings
-    data = firebase_client.get_all_embeddings(collection_name, limit)
+    data = await asyncio.to_thread(firebase_client.get_all_embeddings, collection_name, limit)
     
     items = []
     for k, v in data.items():
@@ -85,13 +85,8 @@ async def list_embeddings(collection_name: str, limit: int = 50):
     }
 
 @router.delete("/delete/{collection_name}/{item_id}", response_model=Dict)
-async def delete_embedding(collection_name: str, item_id: str):
-    firebase_client = FirebaseClient()
-    
-    if not firebase_client.is_connected():
-        raise HTTPException(status_code=503, detail="Firebase not connected")
-    
-    success = firebase_client.delete_embedding(collection_name, item_id)
+async def delete_embedding(collection_name: str, item_id: str, firebase_client: FirebaseClient = Depends(get_firebase_client)):
+    success = await asyncio.to_thread(firebase_client.delete_embedding, collection_name, item_id)
     
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete from Firebase")
@@ -99,20 +94,19 @@ async def delete_embedding(collection_name: str, item_id: str):
     return {"success": True, "message": f"Embedding deleted for {item_id}"}
 
 @router.delete("/reset/{collection_name}", response_model=Dict)
-async def reset_collection(collection_name: str):
-    firebase_client = FirebaseClient()
+async def reset_collection(collection_name: str, firebase_client: FirebaseClient = Depends(get_firebase_client)):
+    # Hanya item_id yang dibutuhkan untuk menghapus, embeddings tidak perlu diunduh
+    embeddings = await asyncio.to_thread(firebase_client.get_all_embeddings, collection_name, fields=["item_id"])
     
-    if not firebase_client.is_connected():
-        raise HTTPException(status_code=503, detail="Firebase not connected")
+    # Hapus dokumen secara bersamaan, dibatasi semaphore agar tidak membanjiri Firestore
+    semaphore = asyncio.Semaphore(_DELETE_CONCURRENCY)
     
-    # Get all embeddings
-    embeddings = firebase_client.get_all_embeddings(collection_name)
+    async def _delete(item_id):
+        async with semaphore:
+            return await asyncio.to_thread(firebase_client.delete_embedding, collection_name, item_id)
     
-    # Delete each embedding
-    deleted_count = 0
-    for item_id in embeddings.keys():
-        if firebase_client.delete_embedding(collection_name, item_id):
-            deleted_count += 1
+    results = await asyncio.gather(*[_delete(item_id) for item_id in embeddings.keys()])
+    deleted_count = sum(1 for deleted in results if deleted)
     
     return {
         "success": True, 
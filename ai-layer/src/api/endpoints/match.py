@@ -1,23 +1,24 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from src.core.schemas.request import InstantMatchRequest, BatchMatchRequest, BackgroundMatchRequest
 from src.core.schemas.response import APIResponse, MatchResult, BatchMatchResult
 from src.core.services.matching_service import MatchingService
+from src.api.dependencies import get_matching_service
 
 router = APIRouter(prefix="/match", tags=["match"])
 
 # Perform instant matching for a new item against existing items
 @router.post("/instant", response_model=APIResponse)
-async def instant_match(request: InstantMatchRequest):
+async def instant_match(request: InstantMatchRequest, matching_service: MatchingService = Depends(get_matching_service)):
     try:
-        matching_service = MatchingService()
-        
         # Validate collection
         if request.collection not in ["lost_items", "found_items"]:
             raise ValueError("Collection must be either 'lost_items' or 'found_items'")
         
-        # Perform matching
-        match_result = matching_service.instant_match(
-            item_data=request.dict(),
+        # Perform matching (download gambar dan inferensi di thread agar event loop tidak terblokir)
+        match_result = await asyncio.to_thread(
+            matching_service.instant_match,
+            item_data=request.model_dump(),
             collection=request.collection
         )
         
@@ -33,23 +34,19 @@ async def instant_match(request: InstantMatchRequest):
 
 # Process batch matching for multiple items
 @router.post("/batch", response_model=APIResponse)
-async def batch_match(request: BatchMatchRequest):
+async def batch_match(request: BatchMatchRequest, matching_service: MatchingService = Depends(get_matching_service)):
     try:
-        matching_service = MatchingService()
-        results = []
-        
+        # Validate collection
         for item in request.items:
-            # Validate collection
             if item.collection not in ["lost_items", "found_items"]:
                 raise ValueError(f"Collection must be either 'lost_items' or 'found_items' for item {item.item_id}")
-            
-            # Perform matching for each item
-            match_result = matching_service.instant_match(
-                item_data=item.dict(),
-                collection=item.collection,
-                threshold=request.threshold
-            )
-            results.append(match_result)
+        
+        # Semua item diproses sekaligus agar similarity dihitung dengan satu perkalian matriks
+        results = await asyncio.to_thread(
+            matching_service.batch_match,
+            [item.model_dump() for item in request.items],
+            request.threshold
+        )
         
         return {
             "success": True,
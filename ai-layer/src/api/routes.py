@@ -1,27 +1,127 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import hashlib
+import time
+import orjson
+import torch
+from fastapi import APIRouter, Depends, Request, Response
 from src.api.endpoints import embeddings, match, firebase_admin
+from src.core.device import CUDA_AVAILABLE, DEVICE
+from src.core.models.clip_model import ClipModel
+from src.core.models.sentence_transformer import SentenceTransformerModel
 from src.core.services.cache_service import CacheService
 from src.database.firebase import FirebaseClient
 
 router = APIRouter()
 
+# Info GPU tidak berubah selama proses berjalan, cukup dibaca sekali
+_GPU_COUNT = torch.cuda.device_count() if CUDA_AVAILABLE else 0
+_GPU_NAME = torch.cuda.get_device_name(0) if CUDA_AVAILABLE else None
+_MB = 1 << 20
+
+# Hasil uji forward pass model di-cache agar polling monitoring tidak membebani GPU
+_DEEP_CHECK_TTL = 10
+_deep_check_cache = {"functional": None, "expires_at": 0.0}
+
+# Uji forward pass kedua model secara bersamaan
+async def _check_models_functional():
+    now = time.monotonic()
+    if _deep_check_cache["expires_at"] > now:
+        return _deep_check_cache["functional"]
+    
+    try:
+        await asyncio.gather(
+            asyncio.to_thread(ClipModel().warmup),
+            asyncio.to_thread(SentenceTransformerModel().warmup)
+        )
+        functional = True
+    except Exception as e:
+        print(f"Error during model health check: {e}")
+        functional = False
+    
+    _deep_check_cache["functional"] = functional
+    _deep_check_cache["expires_at"] = now + _DEEP_CHECK_TTL
+    return functional
+
+# Body /ping tidak berubah selama proses berjalan, serialisasi sekali saja
+_PING_BODY = orjson.dumps({"status": "ok", "service": "unylost-ai-layer"})
+_PING_ETAG = f'"{hashlib.md5(_PING_BODY).hexdigest()}"'
+
+# Lightweight uptime endpoint
+@router.get("/ping", tags=["health"])
+async def ping(request: Request):
+    if request.headers.get("if-none-match") == _PING_ETAG:
+        return Response(status_code=304, headers={"ETag": _PING_ETAG})
+    return Response(content=_PING_BODY, media_type="application/json", headers={"ETag": _PING_ETAG})
+
+# Liveness probe untuk orchestrator, tanpa menyentuh Redis, Firebase maupun GPU
+_LIVE_BODY = b'{"status":"alive"}'
+
+@router.get("/live", tags=["health"])
+async def live():
+    return Response(content=_LIVE_BODY, media_type="application/json")
+
 # Health check endpoint
+# Gunakan ?deep=true untuk menyertakan statistik Redis dan uji forward pass model,
+# dan ?reset_peak=true untuk mereset statistik puncak memori GPU setelah dibaca
 @router.get("/health", tags=["health"])
-async def health_check():
-    from src.database.firebase import FirebaseClient
-    from src.core.services.cache_service import CacheService
-    
+async def health_check(deep: bool = False, reset_peak: bool = False):
     firebase_client = FirebaseClient()
     cache_service = CacheService()
-    redis_status = cache_service.get_redis_status()
+    models_status = {
+        "clip_ready": ClipModel._instance is not None,
+        "sentence_ready": SentenceTransformerModel._instance is not None
+    }
+    
+    # Ping Redis di thread terpisah agar event loop tidak terblokir
+    redis_check = asyncio.to_thread(cache_service.get_redis_status, deep)
+    if deep:
+        redis_status, models_status["functional"] = await asyncio.gather(
+            redis_check,
+            _check_models_functional()
+        )
+    else:
+        redis_status = await redis_check
+    
+    device_status = {
+        "device": DEVICE,
+        "gpu_count": _GPU_COUNT,
+        "gpu_name": _GPU_NAME
+    }
+    
+    # Hanya pemakaian memori yang dibaca ulang setiap request
+    if CUDA_AVAILABLE:
+        device_status["memory_allocated_mb"] = round(torch.cuda.memory_allocated() / _MB, 2)
+        device_status["memory_reserved_mb"] = round(torch.cuda.memory_reserved() / _MB, 2)
+        device_status["peak_allocated_mb"] = round(torch.cuda.max_memory_allocated() / _MB, 2)
+        device_status["peak_reserved_mb"] = round(torch.cuda.max_memory_reserved() / _MB, 2)
+        if reset_peak:
+            torch.cuda.reset_peak_memory_stats()
+    
+    firebase_connected = firebase_client.is_connected()
+    
+    # Skor kesehatan dihitung langsung dari flag komponen tanpa rantai if
+    health_score = (
+        100
+        - 30 * (not models_status["clip_ready"])
+        - 30 * (not models_status["sentence_ready"])
+        - 20 * (not firebase_connected)
+        - 20 * (not redis_status["connected"])
+    )
+    health_state = ("unhealthy", "degraded", "healthy")[(health_score >= 70) + (health_score >= 90)]
     
     return {
         "status": "ok", 
         "service": "unylost-ai-layer",
+        "health": {
+            "score": health_score,
+            "state": health_state
+        },
         "redis": redis_status,
         "firebase": {
-            "connected": firebase_client.is_connected()
-        }
+            "connected": firebase_connected
+        },
+        "models": models_status,
+        "device": device_status
     }
     
 @router.get("/firebase-status", tags=["health"])
@@ -9,4 +9,35 @@ ENV = os.getenv("ENV", "development")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
 API_PREFIX = "/api"
-PROJECT_NAME = "UNYLost AI Layer"
\ No newline at end of file
+PROJECT_NAME = "UNYLost AI Layer"
+
+# Origin yang diizinkan untuk CORS (dipisah koma); localhost selalu diizinkan lewat regex
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
+CORS_ORIGIN_REGEX = os.getenv("CORS_ORIGIN_REGEX", r"https?://localhost(:\d+)?")
+
+# Batas porsi memori GPU yang boleh dipakai proses ini
+CUDA_MEMORY_FRACTION = float(os.getenv("CUDA_MEMORY_FRACTION", 0.8))
+
+# Matriks embeddings koleksi di-cache di memori; dimuat ulang saat ada penulisan atau setelah TTL
+EMBEDDING_INDEX_TTL = int(os.getenv("EMBEDDING_INDEX_TTL", 300))
+# Tipe data matriks di cache: float16 menghemat separuh memori, similarity tetap dihitung dalam float32
+EMBEDDING_INDEX_DTYPE = os.getenv("EMBEDDING_INDEX_DTYPE", "float32")
+
+# Micro-batching inferensi teks: panggilan yang datang dalam jendela ini digabung jadi satu forward pass
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 10))
+
+# Jumlah embedding gambar yang di-cache di memori, per URL dan per hash isi gambar
+IMAGE_EMBEDDING_CACHE_SIZE = int(os.getenv("IMAGE_EMBEDDING_CACHE_SIZE", 10000))
+
+# Jumlah embedding teks yang di-cache di memori, dikunci hash teks yang sudah dinormalisasi
+TEXT_EMBEDDING_CACHE_SIZE = int(os.getenv("TEXT_EMBEDDING_CACHE_SIZE", 10000))
+
+# Jumlah maksimum hasil match per item (0 = tanpa batas)
+MATCH_MAX_RESULTS = int(os.getenv("MATCH_MAX_RESULTS", 0))
+
+# Bobot model CLIP dan Sentence Transformer dimuat dalam float16 saat berjalan di GPU
+MODEL_HALF_PRECISION = os.getenv("MODEL_HALF_PRECISION", "true").lower() == "true"
+
+# Kuantisasi dinamis int8 untuk layer Linear Sentence Transformer saat berjalan di CPU (opsional)
+SENTENCE_TRANSFORMER_INT8 = os.getenv("SENTENCE_TRANSFORMER_INT8", "false").lower() == "true"
\ No newline at end of file
@@ -7,4 +7,5 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
 REDIS_TTL = int(os.getenv("REDIS_TTL", 3600))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
\ No newline at end of file
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_STATS_TTL = int(os.getenv("REDIS_STATS_TTL", 30))
\ No newline at end of file
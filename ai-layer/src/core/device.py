@@ -0,0 +1,9 @@
+import torch
+from src.config import app_config
+
+# Deteksi CUDA sekali saat import, dipakai bersama oleh model dan endpoint health
+CUDA_AVAILABLE = torch.cuda.is_available()
+DEVICE = "cuda" if CUDA_AVAILABLE else "cpu"
+
+# Float16 hanya di GPU (tensor core); di CPU tetap float32
+HALF_PRECISION = CUDA_AVAILABLE and app_config.MODEL_HALF_PRECISION
\ No newline at end of file
@@ -1,9 +1,16 @@
 import torch
 from PIL import Image
+from io import BytesIO
 import numpy as np
 from transformers import CLIPProcessor, CLIPModel
 from src.utils.image_processing import process_image_with_object_detection
 from src.utils.augmentation import generate_augmented_images
+from src.utils.batching import MicroBatcher
+from src.config import app_config
+from src.core.device import DEVICE, HALF_PRECISION
+
+# Gambar dummy untuk warmup dan health check, dibuat sekali saja
+_WARMUP_IMAGE = Image.new('RGB', (224, 224), color=(128, 128, 128))
 
 
 class ClipModel:
@@ -14,21 +21,35 @@ class ClipModel:
             cls._instance = super(ClipModel, cls).__new__(cls)
             cls._instance.model = None
             cls._instance.processor = None
-            cls._instance.device = "cuda" if torch.cuda.is_available() else "cpu"
+            cls._instance.device = DEVICE
+            cls._instance.dtype = torch.float16 if HALF_PRECISION else torch.float32
             cls._instance._load_model()
+            cls._instance.text_batcher = MicroBatcher(
+                cls._instance.get_text_embeddings,
+                max_batch_size=app_config.EMBEDDING_BATCH_SIZE,
+                window=app_config.EMBEDDING_BATCH_WINDOW_MS / 1000
+            )
         return cls._instance
     
     # Load Model and Processor
     def _load_model(self):
         try:
             print(f"Loading CLIP model on {self.device}...")
-            self.model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(self.device)
+            self.model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(self.device, dtype=self.dtype)
             self.processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
             print("CLIP model loaded successfully")
         except Exception as e:
             print(f"Error loading CLIP model: {e}")
             raise
-        
+    
+    # Jalankan forward pass dummy agar allocator dan kernel siap sebelum request pertama
+    def warmup(self):
+        image_inputs = self.processor(images=_WARMUP_IMAGE, return_tensors="pt").to(self.device, dtype=self.dtype)
+        text_inputs = self.processor(text="warmup", return_tensors="pt", padding=True).to(self.device)
+        with torch.inference_mode():
+            self.model.get_image_features(**image_inputs)
+            self.model.get_text_features(**text_inputs)
+    
     def get_image_embedding(self, image):
         try:
             if isinstance(image, str):
@@ -40,11 +61,12 @@ class ClipModel:
             processed_image = process_image_with_object_detection(image)
             
             # Lanjutkan dengan pembuatan embeddings seperti biasa
-            inputs = self.processor(images=processed_image, return_tensors="pt").to(self.device)
-            with torch.no_grad():
+            inputs = self.processor(images=processed_image, return_tensors="pt").to(self.device, dtype=self.dtype)
+            with torch.inference_mode():
                 image_features = self.model.get_image_features(**inputs)
             
             # Normalize features
+            image_features = image_features.float()
             image_embedding = image_features / image_features.norm(dim=1, keepdim=True)
             return image_embedding.cpu().numpy()[0]
         
@@ -52,31 +74,17 @@ class ClipModel:
             print(f"Error generating image embedding: {e}")
             raise
     
-    # Generate embedding for text using CLIP
-    def get_text_embedding(self, text):
-        try:
-            # Preprocessing teks untuk memastikan konsistensi
-            if isinstance(text, str):
-                # Batasi panjang teks untuk konsistensi
-                max_tokens = 77  # Batas token CLIP
-                tokens = text.split()
-                if len(tokens) > max_tokens:
-                    text = " ".join(tokens[:max_tokens])
-                
-            # Proses dengan CLIP model
-            inputs = self.processor(text=text, return_tensors="pt", padding=True, truncation=True, max_length=77).to(self.device)
-            with torch.no_grad():
-                text_features = self.model.get_text_features(**inputs)
-            
-            # Normalize features
-            text_embedding = text_features / text_features.norm(dim=1, keepdim=True)
-            return text_embedding.cpu().numpy()[0]
-        
-        except Exception as e:
-            print(f"Error generating text embedding: {e}")
-            # Return zero vector dengan dimensi yang benar jika error
-            return np.zeros(512)  # CLIP biasanya menghasilkan vektor 512 dimensi
+    # Generate embeddings for a batch of texts in one forward pass
+    def get_text_embeddings(self, texts):
+        inputs = self.processor(text=list(texts), return_tensors="pt", padding=True, truncation=True, max_length=77).to(self.device)
+        with torch.inference_mode():
+            text_features = self.model.get_text_features(**inputs)
         
+        # Normalize features
+        text_features = text_features.float()
+        text_embeddings = text_features / text_features.norm(dim=1, keepdim=True)
+        return list(text_embeddings.cpu().numpy())
+    
     # Hasilkan embedding dengan augmentasi dan rata-rata hasilnya
     def get_image_embedding_with_augmentation(self, image, num_augmentations=3):
         try:
@@ -96,11 +104,12 @@ class ClipModel:
                 processed_image = process_image_with_object_detection(aug_image)
                 
                 # Generate embedding
-                inputs = self.processor(images=processed_image, return_tensors="pt").to(self.device)
-                with torch.no_grad():
+                inputs = self.processor(images=processed_image, return_tensors="pt").to(self.device, dtype=self.dtype)
+                with torch.inference_mode():
                     image_features = self.model.get_image_features(**inputs)
                 
                 # Normalize
+                image_features = image_features.float()
                 embedding = image_features / image_features.norm(dim=1, keepdim=True)
                 all_embeddings.append(embedding.cpu().numpy()[0])
             
@@ -111,11 +120,11 @@ class ClipModel:
             avg_embedding = avg_embedding / np.linalg.norm(avg_embedding)
             
             return avg_embedding
-            
+        
         except Exception as e:
             print(f"Error generating image embedding with augmentation: {e}")
             raise
-        
+    
     # Calculate cosine similarity between two embeddings
     def calculate_similarity(self, embedding1, embedding2):
         return np.dot(embedding1, embedding2)
\ No newline at end of file
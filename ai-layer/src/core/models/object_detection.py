@@ -1,3 +1,4 @@
+import threading
 import cv2
 import numpy as np
 import tensorflow as tf
@@ -6,12 +7,17 @@ from io import BytesIO
 
 class ObjectDetector:
     _instance = None
+    _lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(ObjectDetector, cls).__new__(cls)
-            cls._instance.model = None
-            cls._instance._load_model()
+            # Lock agar thread lain tidak memakai instance sebelum model selesai dimuat
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(ObjectDetector, cls).__new__(cls)
+                    instance.model = None
+                    instance._load_model()
+                    cls._instance = instance
         return cls._instance
     
     # Load MobileNet SSD model for object detection
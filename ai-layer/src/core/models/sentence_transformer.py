@@ -1,6 +1,9 @@
 import torch
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from src.utils.batching import MicroBatcher
+from src.config import app_config
+from src.core.device import CUDA_AVAILABLE, DEVICE, HALF_PRECISION
 
 class SentenceTransformerModel:
     _instance = None
@@ -9,8 +12,13 @@ class SentenceTransformerModel:
         if cls._instance is None:
             cls._instance = super(SentenceTransformerModel, cls).__new__(cls)
             cls._instance.model = None
-            cls._instance.device = "cuda" if torch.cuda.is_available() else "cpu"
+            cls._instance.device = DEVICE
             cls._instance._load_model()
+            cls._instance.text_batcher = MicroBatcher(
+                cls._instance.get_text_embeddings,
+                max_batch_size=app_config.EMBEDDING_BATCH_SIZE,
+                window=app_config.EMBEDDING_BATCH_WINDOW_MS / 1000
+            )
         return cls._instance
     
     # Load the Sentence Transformer model
@@ -18,20 +26,28 @@ class SentenceTransformerModel:
         try:
             print(f"Loading Sentence Transformer model on {self.device}...")
             self.model = SentenceTransformer('all-MiniLM-L6-v2', device=self.device)
+            if HALF_PRECISION:
+                self.model.half()
+            elif not CUDA_AVAILABLE and app_config.SENTENCE_TRANSFORMER_INT8:
+                # Bobot Linear disimpan int8 dan aktivasi dikuantisasi per batch (hanya didukung di CPU)
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
             print("Sentence Transformer model loaded successfully")
         except Exception as e:
             print(f"Error loading Sentence Transformer model: {e}")
             raise
     
-    # Generate embedding for text using Sentence Transformer
-    def get_text_embedding(self, text):
-        try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            embedding = embedding / np.linalg.norm(embedding)
-            return embedding
-        except Exception as e:
-            print(f"Error generating text embedding: {e}")
-            raise
+    # Jalankan encode dummy agar allocator dan kernel siap sebelum request pertama
+    def warmup(self):
+        with torch.inference_mode():
+            self.model.encode("warmup", convert_to_numpy=True)
+    
+    # Generate embeddings for a batch of texts in one forward pass
+    def get_text_embeddings(self, texts):
+        with torch.inference_mode():
+            embeddings = self.model.encode(list(texts), batch_size=len(texts), convert_to_numpy=True)
+        embeddings = embeddings.astype(np.float32, copy=False)
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return list(embeddings)
     
     # Calculate cosine similarity between two embeddings
     def calculate_similarity(self, embedding1, embedding2):
@@ -51,8 +51,9 @@ class CacheService:
         key = self.get_cache_key("match", hash_key)
         return self.redis_manager.get(key)
     
-    def get_redis_status(self):
+    def get_redis_status(self, include_stats=True):
+        connected = self.redis_manager.ping()
         return {
-            "connected": self.redis_manager.ping(),
-            "stats": self.redis_manager.get_stats() if self.redis_manager.ping() else None
+            "connected": connected,
+            "stats": self.redis_manager.get_stats() if connected and include_stats else None
         }
\ No newline at end of file
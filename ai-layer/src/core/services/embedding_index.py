@@ -0,0 +1,124 @@
+import threading
+import time
+import numpy as np
+from src.config import app_config
+from src.database.firebase import FirebaseClient
+from src.core.services.similarity_service import SimilarityService, EMBEDDING_TYPES
+
+# Hanya field ini yang dibutuhkan untuk menyusun matriks; metadata item tidak ikut diunduh
+_INDEX_FIELDS = ["item_id", "embeddings", "normalized", "embedding_dtype"]
+
+class EmbeddingIndex:
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(EmbeddingIndex, cls).__new__(cls)
+            cls._instance.firebase_client = FirebaseClient()
+            cls._instance.ttl = app_config.EMBEDDING_INDEX_TTL
+            cls._instance.dtype = np.dtype(app_config.EMBEDDING_INDEX_DTYPE)
+            cls._instance._collections = {}
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+    
+    # Ambil matriks embeddings koleksi; muat ulang dari Firebase hanya jika versi berubah atau TTL habis
+    def get(self, collection_name):
+        version = self.firebase_client.get_collection_version(collection_name)
+        cached = self._collections.get(collection_name)
+        if cached is not None and cached["version"] == version and cached["expires_at"] > time.monotonic():
+            return cached
+        
+        # Dokumen dari stream Firestore langsung disusun ke matriks tanpa dict perantara;
+        # seluruh koleksi dimuat (limit=None) agar semua item menjadi kandidat
+        try:
+            stacked = SimilarityService.stack_embeddings(
+                self.firebase_client.iter_embeddings(collection_name, limit=None, fields=_INDEX_FIELDS)
+            )
+        except Exception as e:
+            print(f"Error retrieving from Firebase: {e}")
+            stacked = SimilarityService.stack_embeddings({})
+        
+        stacked = self._cast(stacked)
+        stacked["version"] = version
+        stacked["expires_at"] = time.monotonic() + self.ttl
+        
+        # Hasil kosong tidak di-cache agar kegagalan sementara tidak bertahan
+        if len(stacked["ids"]) > 0:
+            with self._lock:
+                self._collections[collection_name] = stacked
+        
+        return stacked
+    
+    # Tambahkan atau ganti satu baris setelah item disimpan, tanpa memuat ulang seluruh koleksi
+    def upsert(self, collection_name, item_id, embeddings):
+        self.upsert_many(collection_name, [(item_id, embeddings)])
+    
+    # Sama seperti upsert, untuk beberapa baris yang disimpan dalam satu penulisan (satu kenaikan versi)
+    def upsert_many(self, collection_name, rows):
+        with self._lock:
+            cached = self._collections.get(collection_name)
+            if cached is None:
+                return
+            
+            # Jika ada penulisan lain sejak cache dibuat, buang cache dan biarkan dimuat ulang
+            version = self.firebase_client.get_collection_version(collection_name)
+            if cached["version"] != version - 1:
+                del self._collections[collection_name]
+                return
+            
+            updated = cached
+            for item_id, embeddings in rows:
+                updated = self._with_row(updated, item_id, embeddings)
+            updated = self._cast(updated)
+            updated["version"] = version
+            updated["expires_at"] = cached["expires_at"]
+            self._collections[collection_name] = updated
+    
+    # Simpan matriks dengan dtype yang dikonfigurasi (tanpa salinan jika sudah sesuai)
+    def _cast(self, stacked):
+        stacked["modalities"] = {
+            emb_type: (matrix.astype(self.dtype, copy=False), mask)
+            for emb_type, (matrix, mask) in stacked["modalities"].items()
+        }
+        return stacked
+    
+    # Bangun salinan matriks dengan satu baris baru/terganti (pembaca lama tetap memakai salinan lama)
+    def _with_row(self, stacked, item_id, embeddings):
+        ids = stacked["ids"]
+        existing = np.nonzero(ids == item_id)[0]
+        if len(existing) > 0:
+            row = existing[0]
+            new_ids = ids
+        else:
+            row = len(ids)
+            new_ids = np.append(ids, np.array([item_id], dtype=object))
+        
+        modalities = {}
+        for emb_type in EMBEDDING_TYPES:
+            vector = embeddings.get(emb_type)
+            if emb_type in stacked["modalities"]:
+                matrix, mask = stacked["modalities"][emb_type]
+            elif vector is not None:
+                matrix = np.zeros((len(ids), len(vector)), dtype=np.float32)
+                mask = np.zeros(len(ids), dtype=bool)
+            else:
+                continue
+            
+            if row == len(ids):
+                matrix = np.vstack([matrix, np.zeros((1, matrix.shape[1]), dtype=np.float32)])
+                mask = np.append(mask, False)
+            else:
+                matrix = matrix.copy()
+                mask = mask.copy()
+            
+            matrix[row] = 0.0
+            mask[row] = vector is not None
+            if vector is not None and len(vector) == matrix.shape[1]:
+                matrix[row] = vector
+            
+            modalities[emb_type] = (matrix, mask)
+        
+        return {
+            "ids": new_ids,
+            "modalities": modalities
+        }
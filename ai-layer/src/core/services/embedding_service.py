@@ -1,7 +1,23 @@
+import hashlib
 import numpy as np
+from src.config import app_config
 from src.core.models.clip_model import ClipModel
 from src.core.models.sentence_transformer import SentenceTransformerModel
 from src.core.services.cache_service import CacheService
+from src.utils.cache_utils import LRUCache
+from src.utils.image_processing import decode_image_bytes, fetch_image_bytes, load_image, placeholder_image
+
+# Cache embedding gambar lintas request: per URL (lewati unduhan) dan per hash isi (lewati CLIP)
+_image_url_cache = LRUCache(app_config.IMAGE_EMBEDDING_CACHE_SIZE)
+_image_content_cache = LRUCache(app_config.IMAGE_EMBEDDING_CACHE_SIZE)
+
+# Cache embedding teks lintas item; deskripsi yang sama tidak diproses model dua kali
+_text_embedding_cache = LRUCache(app_config.TEXT_EMBEDDING_CACHE_SIZE)
+
+# Kunci cache teks: nama model + hash teks (huruf kecil, spasi dirapikan; kedua model uncased)
+def _text_cache_key(model_name, text):
+    normalized = " ".join(text.lower().split())
+    return (model_name, hashlib.blake2b(normalized.encode(), digest_size=16).digest())
 
 class EmbeddingService:
     def __init__(self):
@@ -29,6 +45,51 @@ class EmbeddingService:
         
         return embedding
     
+    # Embedding gambar dari URL; URL atau isi gambar yang sama tidak diunduh/diproses ulang
+    def get_image_embedding_from_url(self, image_url, item_id=None, use_augmentation=True):
+        if not image_url.startswith(('http://', 'https://')):
+            return self.get_image_embedding(load_image(image_url), item_id, use_augmentation)
+        
+        if item_id:
+            cached_embedding = self.cache_service.get("img_emb", item_id, as_numpy=True)
+            if cached_embedding is not None:
+                print(f"Cache hit for image embedding: {item_id}")
+                return cached_embedding
+        
+        url_key = (image_url, use_augmentation)
+        embedding = _image_url_cache.get(url_key)
+        if embedding is None:
+            try:
+                print(f"Loading image from URL: {image_url}")
+                content = fetch_image_bytes(image_url)
+            except Exception as e:
+                # Gambar pengganti tidak di-cache (termasuk di Redis, tanpa item_id) agar URL dicoba lagi
+                print(f"Error downloading image from URL: {str(e)}")
+                return self.get_image_embedding(placeholder_image(), use_augmentation=use_augmentation)
+            
+            content_key = (hashlib.sha256(content).digest(), use_augmentation)
+            embedding = _image_content_cache.get(content_key)
+            if embedding is None:
+                try:
+                    image = decode_image_bytes(content)
+                except Exception as e:
+                    # Isi bukan gambar (mis. halaman HTML Google Drive): sama seperti gagal unduh, tanpa cache
+                    print(f"Error decoding image from URL: {str(e)}")
+                    return self.get_image_embedding(placeholder_image(), use_augmentation=use_augmentation)
+                embedding = self.get_image_embedding(image, use_augmentation=use_augmentation)
+                _image_content_cache.set(content_key, embedding)
+            else:
+                print(f"Cache hit for image content: {image_url}")
+            
+            _image_url_cache.set(url_key, embedding)
+        else:
+            print(f"Cache hit for image URL: {image_url}")
+        
+        if item_id:
+            self.cache_service.set("img_emb", item_id, embedding)
+        
+        return embedding
+    
     def get_text_embedding_clip(self, text, item_id=None):
     # Check cache if item_id is provided
         if item_id:
@@ -37,9 +98,14 @@ class EmbeddingService:
                 print(f"Cache hit for CLIP text embedding: {item_id}")
                 return cached_embedding
         
+        text_key = _text_cache_key("clip", text)
+        
         try:
-            # Generate embedding
-            embedding = self.clip_model.get_text_embedding(text)
+            embedding = _text_embedding_cache.get(text_key)
+            if embedding is None:
+                # Generate embedding
+                # Lewat micro-batcher agar request bersamaan berbagi satu forward pass
+                embedding = self.clip_model.text_batcher.submit(text)
             
             # Verify embedding dimensions
             if embedding.shape[0] != 512:
@@ -54,6 +120,8 @@ class EmbeddingService:
                     # Truncate
                     embedding = embedding[:512]
             
+            _text_embedding_cache.set(text_key, embedding)
+            
             # Cache if item_id is provided
             if item_id:
                 self.cache_service.set("txt_clip_emb", item_id, embedding)
@@ -75,8 +143,12 @@ class EmbeddingService:
                 print(f"Cache hit for Sentence Transformer text embedding: {item_id}")
                 return cached_embedding
         
-        # Generate embedding
-        embedding = self.sentence_transformer.get_text_embedding(text)
+        text_key = _text_cache_key("sentence", text)
+        embedding = _text_embedding_cache.get(text_key)
+        if embedding is None:
+            # Generate embedding
+            embedding = self.sentence_transformer.text_batcher.submit(text)
+            _text_embedding_cache.set(text_key, embedding)
         
         # Cache if item_id is provided
         if item_id:
@@ -84,6 +156,58 @@ class EmbeddingService:
         
         return embedding
     
+    # Versi batch: cache diperiksa per teks, teks yang belum ada diproses dalam satu forward pass per model
+    def get_text_embeddings_batch(self, texts, item_ids=None):
+        item_ids = item_ids or [None] * len(texts)
+        clip_embeddings = self._get_text_embeddings_batch(texts, item_ids, "clip", "txt_clip_emb", self.clip_model)
+        sentence_embeddings = self._get_text_embeddings_batch(texts, item_ids, "sentence", "txt_st_emb", self.sentence_transformer)
+        return clip_embeddings, sentence_embeddings
+    
+    def _get_text_embeddings_batch(self, texts, item_ids, model_name, cache_type, model):
+        embeddings = [None] * len(texts)
+        missing = {}
+        
+        for idx, (text, item_id) in enumerate(zip(texts, item_ids)):
+            # Check cache if item_id is provided
+            if item_id:
+                cached_embedding = self.cache_service.get(cache_type, item_id, as_numpy=True)
+                if cached_embedding is not None:
+                    print(f"Cache hit for {model_name} text embedding: {item_id}")
+                    embeddings[idx] = cached_embedding
+                    continue
+            
+            text_key = _text_cache_key(model_name, text)
+            embeddings[idx] = _text_embedding_cache.get(text_key)
+            if embeddings[idx] is None:
+                # Teks yang sama dalam satu batch cukup diproses sekali
+                missing.setdefault(text_key, []).append(idx)
+            elif item_id:
+                self.cache_service.set(cache_type, item_id, embeddings[idx])
+        
+        if missing:
+            text_keys = list(missing)
+            missing_texts = [texts[missing[text_key][0]] for text_key in text_keys]
+            
+            # Satu teks tetap lewat micro-batcher agar bisa digabung dengan request lain
+            if len(missing_texts) == 1:
+                generated = [model.text_batcher.submit(missing_texts[0])]
+            else:
+                # Dipecah per EMBEDDING_BATCH_SIZE agar batch besar tidak menghabiskan memori GPU
+                generated = []
+                for start in range(0, len(missing_texts), app_config.EMBEDDING_BATCH_SIZE):
+                    generated.extend(model.get_text_embeddings(missing_texts[start:start + app_config.EMBEDDING_BATCH_SIZE]))
+            
+            for text_key, embedding in zip(text_keys, generated):
+                _text_embedding_cache.set(text_key, embedding)
+                for idx in missing[text_key]:
+                    embeddings[idx] = embedding
+                    
+                    # Cache if item_id is provided
+                    if item_ids[idx]:
+                        self.cache_service.set(cache_type, item_ids[idx], embedding)
+        
+        return embeddings
+    
     def get_hybrid_embedding(self, text, image=None, item_id=None):
         result = {
             "clip_text": self.get_text_embedding_clip(text, item_id),
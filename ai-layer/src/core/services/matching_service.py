@@ -1,9 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from src.config import app_config
 from src.core.services.embedding_service import EmbeddingService
 from src.database.firebase import FirebaseClient
 from src.core.services.cache_service import CacheService
 from src.utils.text_processing import combine_item_text, preprocess_text
 from src.core.services.similarity_service import SimilarityService
+from src.core.services.embedding_index import EmbeddingIndex
 
 
 class MatchingService:
@@ -11,17 +14,15 @@ class MatchingService:
         self.embedding_service = EmbeddingService()
         self.firebase_client = FirebaseClient()
         self.cache_service = CacheService()
+        self.embedding_index = EmbeddingIndex()
     
     def calculate_similarity(self, embedding1, embedding2):
-        try:
-            if len(embedding1) != len(embedding2):
-                print(f"Warning: Dimension mismatch. Embedding1: {len(embedding1)}, Embedding2: {len(embedding2)}")
-                return 0.0
-            
-            return np.dot(embedding1, embedding2)
-        except Exception as e:
-            print(f"Error calculating similarity: {e}")
+        if len(embedding1) != len(embedding2):
+            print(f"Warning: Dimension mismatch. Embedding1: {len(embedding1)}, Embedding2: {len(embedding2)}")
             return 0.0
+        
+        # Embeddings tersimpan sudah ternormalisasi, jadi dot product langsung = cosine similarity
+        return float(np.dot(embedding1, embedding2))
     
     def calculate_hybrid_similarity(self, embeddings1, embeddings2):
         try:
@@ -33,79 +34,53 @@ class MatchingService:
             return 0.0
     
     def find_matches(self, item_embeddings, candidate_embeddings, threshold=0.6):
-        matches = []
-        
         print(f"Looking for matches among {len(candidate_embeddings)} candidates")
-        print(f"Item embeddings keys: {item_embeddings.keys()}")
         
-        for candidate_id, candidate_data in candidate_embeddings.items():
-            try:
-                # Skip jika membandingkan dengan diri sendiri
-                if candidate_id == item_embeddings.get('item_id'):
-                    print(f"Skipping self-match with {candidate_id}")
-                    continue
-                    
-                # Extract embeddings dari data kandidat
-                candidate_emb = {}
-                
-                # Handle different data structures
-                if 'embeddings' in candidate_data:
-                    candidate_emb = candidate_data['embeddings']
-                else:
-                    # Try to use the data directly if no embeddings key
-                    for key in ['clip_text', 'sentence_text', 'image']:
-                        if key in candidate_data:
-                            candidate_emb[key] = candidate_data[key]
-                
-                # Tambahkan debug untuk lihat kandidat
-                print(f"Candidate {candidate_id} has embedding keys: {candidate_emb.keys()}")
-                
-                # Skip if no embeddings found
-                if not candidate_emb:
-                    print(f"Warning: No embeddings found for candidate {candidate_id}")
-                    continue
-                
-                # Check if embeddings are compatible
-                compatible_keys = [k for k in item_embeddings.keys() if k in candidate_emb.keys() and k not in ['item_id']]
-                print(f"Compatible embedding keys: {compatible_keys}")
-                
-                if not compatible_keys:
-                    print(f"No compatible embeddings between item and candidate {candidate_id}")
-                    continue
-                    
-                # Calculate similarity with all available embeddings
-                similarity_components = {}
-                for key in compatible_keys:
-                    if key in ['clip_text', 'sentence_text', 'image']:
-                        try:
-                            sim = self.calculate_similarity(item_embeddings[key], candidate_emb[key])
-                            similarity_components[key] = sim
-                            print(f"Similarity for {key}: {sim}")
-                        except Exception as e:
-                            print(f"Error calculating similarity for {key}: {e}")
-                
-                # Calculate average similarity
-                if similarity_components:
-                    avg_similarity = sum(similarity_components.values()) / len(similarity_components)
-                    print(f"Average similarity with {candidate_id}: {avg_similarity}")
-                    
-                    if avg_similarity >= threshold:
-                        matches.append({
-                            "id": candidate_id,
-                            "similarity": round(float(avg_similarity), 4),
-                            "match_type": "hybrid" if len(similarity_components) > 1 else list(similarity_components.keys())[0]
-                        })
-                
-            except Exception as e:
-                print(f"Error processing candidate {candidate_id}: {e}")
-                continue
+        stacked = SimilarityService.stack_embeddings(candidate_embeddings)
+        matches = self._match_stacked(item_embeddings, stacked, threshold)
         
-        # Sort matches by similarity score (descending)
-        matches.sort(key=lambda x: x["similarity"], reverse=True)
         print(f"Found {len(matches)} matches above threshold {threshold}")
-        
         return matches
     
+    # Cocokkan item dengan matriks kandidat yang sudah disusun per tipe embedding
+    def _match_stacked(self, item_embeddings, stacked, threshold, max_results=app_config.MATCH_MAX_RESULTS):
+        return self._match_stacked_batch([item_embeddings], stacked, threshold, max_results)[0]
+    
+    # Cocokkan beberapa item sekaligus dengan satu perkalian matriks per tipe embedding
+    def _match_stacked_batch(self, items_embeddings, stacked, threshold, max_results=app_config.MATCH_MAX_RESULTS):
+        scores, counts, components = SimilarityService.average_similarity_batch(items_embeddings, stacked)
+        ids = stacked["ids"]
+        
+        all_matches = []
+        for q, item_embeddings in enumerate(items_embeddings):
+            # Kandidat harus punya minimal satu embedding yang kompatibel dan bukan item itu sendiri
+            eligible = (counts[q] > 0) & (scores[q] >= threshold) & (ids != item_embeddings.get('item_id'))
+            
+            candidate_idx = np.nonzero(eligible)[0]
+            
+            # Urutkan menurun di numpy; dengan batas hasil, top-k lewat argpartition sudah terurut
+            if max_results:
+                candidate_idx = candidate_idx[SimilarityService.top_k_indices(scores[q, candidate_idx], max_results)]
+            else:
+                candidate_idx = candidate_idx[np.argsort(-scores[q, candidate_idx], kind="stable")]
+            
+            matches = []
+            for i in candidate_idx:
+                if counts[q, i] > 1:
+                    match_type = "hybrid"
+                else:
+                    match_type = next(emb_type for emb_type, (_, mask) in components.items() if mask[q, i])
+                
+                matches.append({
+                    "id": ids[i],
+                    "similarity": round(float(scores[q, i]), 4),
+                    "match_type": match_type
+                })
+            
+            all_matches.append(matches)
+        
+        return all_matches
+    
     def instant_match(self, item_data, collection, threshold=5):
         try:
             cache_key = f"match:{item_data['item_id']}:{collection}"
@@ -115,110 +90,235 @@ class MatchingService:
                 print(f"Cache hit for match result: {item_data['item_id']}")
                 return cached_result
             
-            item_embeddings = {}
+            item_embeddings = self._generate_item_embeddings(item_data)
+            self._save_item_embeddings(item_data, collection, item_embeddings)
+            stacked = self._get_candidates(collection)
             
-            # Generate text embeddings
+            # Find matches
+            matches = []
             try:
-                if "item_name" in item_data and "description" in item_data:
-                    text = combine_item_text(
-                        item_data.get('item_name', ''), 
-                        item_data.get('description', ''), 
-                        with_synonyms=True
-                    )
-                    
-                    item_embeddings["clip_text"] = self.embedding_service.get_text_embedding_clip(text, item_data.get("item_id"))
-                    item_embeddings["sentence_text"] = self.embedding_service.get_text_embedding_sentence(text, item_data.get("item_id"))
-            except Exception as e:
-                print(f"Error generating text embeddings: {e}")
-                # Continue with empty text embeddings
+                matches = self._match_stacked(item_embeddings, stacked, threshold)
+                print(f"Found {len(matches)} matches above threshold {threshold}")
+            except Exception as match_err:
+                print(f"Error in finding matches: {match_err}")
+                # Return empty matches if error
             
-            # Generate image embeddings
-            try:
-                if "image_urls" in item_data and item_data["image_urls"]:
-                    for idx, image_url in enumerate(item_data["image_urls"]):
-                        try:
-                            print(f"Processing image {idx+1}/{len(item_data['image_urls'])}: {image_url}")
-                            from src.utils.image_processing import load_image
-                            
-                            image = load_image(image_url)
-                            
-                            if idx == 0:  # Use only first image for now
-                                item_embeddings["image"] = self.embedding_service.get_image_embedding(image, item_data.get("item_id"))
-                                break
-                        except Exception as img_err:
-                            print(f"Error processing image {idx+1}: {img_err}")
-                            continue
-            except Exception as e:
-                print(f"Error in image embedding process: {e}")
-                # Continue without image embeddings
+            result = self._build_match_result(item_data, matches)
+            
+            # Cache the result
+            self.cache_service.set(cache_key, item_data['item_id'], result)
             
-            # Save to Firebase - handle potential errors
+            return result
+        except Exception as e:
+            print(f"Unexpected error in instant_match: {e}")
+            return self._build_error_result(item_data, e)
+    
+    # Proses beberapa item sekaligus; similarity dihitung dengan satu GEMM per koleksi target
+    def batch_match(self, items_data, threshold=0.75):
+        results = [None] * len(items_data)
+        to_process = []
+        pending = {}
+        
+        for idx, item_data in enumerate(items_data):
             try:
-                # Set item_id in embeddings for reference
-                item_embeddings["item_id"] = item_data["item_id"]
+                cache_key = f"match:{item_data['item_id']}:{item_data['collection']}"
+                cached_result = self.cache_service.get(cache_key, item_data['item_id'])
                 
-                firebase_collection = "lost_items" if collection == "found_items" else "found_items"
-                metadata = {
-                    "name": item_data.get("item_name", ""),
-                    "description": item_data.get("description", ""),
-                    "collection": collection,
-                    "image_urls": item_data.get("image_urls", [])
-                }
+                if cached_result:
+                    print(f"Cache hit for match result: {item_data['item_id']}")
+                    results[idx] = cached_result
+                    continue
                 
-                self.firebase_client.save_embedding(
-                    collection_name=firebase_collection,
-                    item_id=item_data["item_id"],
-                    embeddings=item_embeddings,
-                    metadata=metadata
-                )
-            except Exception as firebase_err:
-                print(f"Error saving to Firebase: {firebase_err}")
-            
-            # Get candidates for matching
-            target_collection = "found_items" if collection == "lost_items" else "lost_items"
-            candidates = {}
-            
-            try:
-                candidates = self.firebase_client.get_all_embeddings(target_collection)
-                print(f"Found {len(candidates)} candidates in {target_collection}")
+                to_process.append((idx, item_data))
             except Exception as e:
-                print(f"Error getting candidates: {e}")
-                # Use empty candidates if error
-            
-            if not candidates:
-                print("No candidates found, using mock data")
-                candidates = self._get_mock_candidates(collection)
+                print(f"Unexpected error in batch_match for {item_data.get('item_id')}: {e}")
+                results[idx] = self._build_error_result(item_data, e)
+        
+        # Embeddings semua item dibuat sekaligus: satu forward pass teks per model, gambar diunduh paralel
+        if to_process:
+            items_embeddings = self._generate_items_embeddings([item_data for _, item_data in to_process])
+            for (idx, item_data), item_embeddings in zip(to_process, items_embeddings):
+                pending.setdefault(item_data["collection"], []).append((idx, item_data, item_embeddings))
+        
+        self._save_items_embeddings_bulk(
+            (item_data, collection, item_embeddings)
+            for collection, group in pending.items()
+            for _, item_data, item_embeddings in group
+        )
+        
+        for collection, group in pending.items():
+            stacked = self._get_candidates(collection)
             
-            # Find matches
-            matches = []
             try:
-                matches = self.find_matches(item_embeddings, candidates, threshold)
+                all_matches = self._match_stacked_batch([emb for _, _, emb in group], stacked, threshold)
             except Exception as match_err:
                 print(f"Error in finding matches: {match_err}")
-                # Return empty matches if error
+                all_matches = [[] for _ in group]
             
-            result = {
-                "item_id": item_data.get("item_id", "unknown"),
-                "matches": matches,
-                "total_matches": len(matches),
-                "has_high_similarity": any(m["similarity"] > 0.85 for m in matches)
-            }
+            for (idx, item_data, _), matches in zip(group, all_matches):
+                result = self._build_match_result(item_data, matches)
+                self.cache_service.set(f"match:{item_data['item_id']}:{collection}", item_data['item_id'], result)
+                results[idx] = result
+        
+        return results
+    
+    def _generate_item_embeddings(self, item_data):
+        return self._generate_items_embeddings([item_data])[0]
+    
+    # Generate embeddings untuk beberapa item; jalur satu item memakai fungsi yang sama dengan batch berukuran 1
+    def _generate_items_embeddings(self, items_data):
+        items_embeddings = [{} for _ in items_data]
+        
+        # Generate text embeddings
+        try:
+            text_items = [
+                (idx, item_data) for idx, item_data in enumerate(items_data)
+                if "item_name" in item_data and "description" in item_data
+            ]
             
-            # Cache the result
-            self.cache_service.set(cache_key, item_data['item_id'], result)
+            if text_items:
+                texts = [
+                    combine_item_text(
+                        item_data.get('item_name', ''), 
+                        item_data.get('description', ''), 
+                        with_synonyms=True
+                    )
+                    for _, item_data in text_items
+                ]
+                
+                clip_embeddings, sentence_embeddings = self.embedding_service.get_text_embeddings_batch(
+                    texts, [item_data.get("item_id") for _, item_data in text_items]
+                )
+                
+                for (idx, _), clip_embedding, sentence_embedding in zip(text_items, clip_embeddings, sentence_embeddings):
+                    items_embeddings[idx]["clip_text"] = clip_embedding
+                    items_embeddings[idx]["sentence_text"] = sentence_embedding
+        except Exception as e:
+            print(f"Error generating text embeddings: {e}")
+            # Continue with empty text embeddings
+        
+        # Generate image embeddings
+        image_items = [(idx, item_data) for idx, item_data in enumerate(items_data) if item_data.get("image_urls")]
+        if len(image_items) == 1:
+            image_embeddings = [self._generate_image_embedding(image_items[0][1])]
+        elif image_items:
+            with ThreadPoolExecutor(max_workers=min(len(image_items), app_config.EMBEDDING_BATCH_SIZE)) as pool:
+                image_embeddings = list(pool.map(self._generate_image_embedding, [item_data for _, item_data in image_items]))
+        else:
+            image_embeddings = []
+        
+        for (idx, _), image_embedding in zip(image_items, image_embeddings):
+            if image_embedding is not None:
+                items_embeddings[idx]["image"] = image_embedding
+        
+        return items_embeddings
+    
+    def _generate_image_embedding(self, item_data):
+        image_urls = item_data["image_urls"]
+        
+        # Use only first image for now
+        try:
+            print(f"Processing image 1/{len(image_urls)}: {image_urls[0]}")
+            return self.embedding_service.get_image_embedding_from_url(image_urls[0], item_data.get("item_id"))
+        except Exception as img_err:
+            print(f"Error processing image 1: {img_err}")
+            # Continue without image embeddings
+            return None
+    
+    # Save to Firebase - handle potential errors
+    def _save_item_embeddings(self, item_data, collection, item_embeddings):
+        try:
+            # Set item_id in embeddings for reference
+            item_embeddings["item_id"] = item_data["item_id"]
             
-            return result
+            firebase_collection = self._opposite_collection(collection)
+            
+            saved = self.firebase_client.save_embedding(
+                collection_name=firebase_collection,
+                item_id=item_data["item_id"],
+                embeddings=item_embeddings,
+                metadata=self._item_metadata(item_data, collection)
+            )
+            
+            # Perbarui matriks cache secara langsung agar tidak perlu memuat ulang koleksi
+            if saved:
+                self.embedding_index.upsert(firebase_collection, item_data["item_id"], item_embeddings)
+        except Exception as firebase_err:
+            print(f"Error saving to Firebase: {firebase_err}")
+    
+    # Simpan embeddings banyak item dengan satu batch write per koleksi Firebase
+    def _save_items_embeddings_bulk(self, entries):
+        grouped = {}
+        for item_data, collection, item_embeddings in entries:
+            # Set item_id in embeddings for reference
+            item_embeddings["item_id"] = item_data["item_id"]
+            
+            firebase_collection = self._opposite_collection(collection)
+            grouped.setdefault(firebase_collection, []).append(
+                (item_data["item_id"], item_embeddings, self._item_metadata(item_data, collection))
+            )
+        
+        for firebase_collection, items in grouped.items():
+            try:
+                saved = self.firebase_client.save_embeddings_bulk(firebase_collection, items)
+                
+                if saved:
+                    self.embedding_index.upsert_many(
+                        firebase_collection,
+                        [(item_id, item_embeddings) for item_id, item_embeddings, _ in items]
+                    )
+            except Exception as firebase_err:
+                print(f"Error saving to Firebase: {firebase_err}")
+    
+    def _item_metadata(self, item_data, collection):
+        return {
+            "name": item_data.get("item_name", ""),
+            "description": item_data.get("description", ""),
+            "collection": collection,
+            "image_urls": item_data.get("image_urls", [])
+        }
+    
+    # Koleksi pasangan: barang hilang dicocokkan dengan barang temuan dan sebaliknya
+    @staticmethod
+    def _opposite_collection(collection):
+        return "found_items" if collection == "lost_items" else "lost_items"
+    
+    # Get candidates for matching
+    def _get_candidates(self, collection):
+        target_collection = self._opposite_collection(collection)
+        stacked = None
+        
+        try:
+            # Matriks kandidat diambil dari cache in-process, Firebase hanya dibaca saat cache usang
+            stacked = self.embedding_index.get(target_collection)
+            print(f"Found {len(stacked['ids'])} candidates in {target_collection}")
         except Exception as e:
-            print(f"Unexpected error in instant_match: {e}")
-            # Return a safe fallback
-            return {
-                "item_id": item_data.get("item_id", "unknown"),
-                "matches": [],
-                "total_matches": 0,
-                "has_high_similarity": False,
-                "error": str(e)
-            }
+            print(f"Error getting candidates: {e}")
+            # Use empty candidates if error
+        
+        if stacked is None or len(stacked["ids"]) == 0:
+            print("No candidates found, using mock data")
+            stacked = SimilarityService.stack_embeddings(self._get_mock_candidates(collection))
+        
+        return stacked
+    
+    def _build_match_result(self, item_data, matches):
+        return {
+            "item_id": item_data.get("item_id", "unknown"),
+            "matches": matches,
+            "total_matches": len(matches),
+            "has_high_similarity": any(m["similarity"] > 0.85 for m in matches)
+        }
     
+    # Return a safe fallback
+    def _build_error_result(self, item_data, error):
+        return {
+            "item_id": item_data.get("item_id", "unknown"),
+            "matches": [],
+            "total_matches": 0,
+            "has_high_similarity": False,
+            "error": str(error)
+        }
     
     def _get_mock_candidates(self, collection):
         mock_data = {}
@@ -1,10 +1,15 @@
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional, Union
+
+EMBEDDING_TYPES = ("clip_text", "sentence_text", "image")
+
+# Tipe embedding yang dimiliki kurang dari 1/3 kandidat dihitung hanya pada baris yang tersedia
+_SPARSE_MODALITY_RATIO = 3
 
 class SimilarityService:
     # Hitung bobot dinamis berdasarkan ketersediaan dan kualitas embeddings
     @staticmethod
-    def compute_dynamic_weights(embeddings1: Dict, embeddings2: Dict) -> Dict[str, float]:
+    def compute_dynamic_weights(embeddings1: Dict, embeddings2: Dict, text_similarity: Optional[float] = None) -> Dict[str, float]:
         weights = {
             "image": 0.4,
             "clip_text": 0.3, 
@@ -24,10 +29,12 @@ class SimilarityService:
         
         # Jika nama item sangat mirip (memiliki kesamaan > 0.8), beri bobot lebih ke teks
         if "clip_text" in embeddings1 and "clip_text" in embeddings2:
-            text_similarity = SimilarityService.cosine_similarity(
-                embeddings1["clip_text"], 
-                embeddings2["clip_text"]
-            )
+            # Pakai skor clip_text yang sudah dihitung pemanggil jika ada
+            if text_similarity is None:
+                text_similarity = SimilarityService.cosine_similarity(
+                    embeddings1["clip_text"], 
+                    embeddings2["clip_text"]
+                )
             
             if text_similarity > 0.8:
                 # Dengan kesamaan teks tinggi, teks lebih penting
@@ -45,48 +52,46 @@ class SimilarityService:
     # Calculate cosine similarity between two vectors
     @staticmethod
     def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
-        try:
-            # Cek apakah dimensi sama
-            if vec1.shape != vec2.shape:
-                print(f"Dimensi berbeda: vec1 {vec1.shape} vs vec2 {vec2.shape}")
-                
-                # Jika dimensi berbeda, resize ke dimensi yang lebih kecil
-                min_dim = min(vec1.shape[0], vec2.shape[0])
-                vec1 = vec1[:min_dim]
-                vec2 = vec2[:min_dim]
-                
-                print(f"Resize ke dimensi: {min_dim}")
-            
-            dot_product = np.dot(vec1, vec2)
-            norm_a = np.linalg.norm(vec1)
-            norm_b = np.linalg.norm(vec2)
+        # Fungsi matematika murni tanpa try/except; error ditangani di pemanggil (batas service)
+        # Embeddings dari cache/JSON bisa berupa list; ubah sekali ke array float
+        vec1 = np.asarray(vec1, dtype=np.float64)
+        vec2 = np.asarray(vec2, dtype=np.float64)
+        
+        # Cek apakah dimensi sama
+        if vec1.shape != vec2.shape:
+            print(f"Dimensi berbeda: vec1 {vec1.shape} vs vec2 {vec2.shape}")
             
-            if norm_a == 0 or norm_b == 0:
-                return 0
+            # Jika dimensi berbeda, resize ke dimensi yang lebih kecil
+            min_dim = min(vec1.shape[0], vec2.shape[0])
+            vec1 = vec1[:min_dim]
+            vec2 = vec2[:min_dim]
             
-            return dot_product / (norm_a * norm_b)
-        except Exception as e:
-            print(f"Error dalam perhitungan similarity: {e}")
-            return 0.0
+            print(f"Resize ke dimensi: {min_dim}")
+        
+        # vdot langsung memanggil BLAS dot; epsilon membuat vektor nol menghasilkan 0 tanpa cabang
+        dot_product = np.dot(vec1, vec2)
+        denominator = np.sqrt(np.vdot(vec1, vec1) * np.vdot(vec2, vec2)) + 1e-12
+        
+        return float(dot_product / denominator)
     
     # Hitung similarity dengan bobot yang bisa dikonfigurasi
     @staticmethod
     def calculate_hybrid_similarity(item1: Dict, item2: Dict, weights: Optional[Dict] = None) -> Dict:
-        # Jika bobot tidak disediakan, gunakan fungsi bobot dinamis
-        if weights is None:
-            weights = SimilarityService.compute_dynamic_weights(item1, item2)
-        
         scores = {}
-        used_weights = {}
         
-        # Hitung similarity untuk setiap tipe embedding
-        for emb_type, weight in weights.items():
+        # Hitung similarity untuk setiap tipe embedding, masing-masing cukup sekali
+        for emb_type in (weights if weights is not None else EMBEDDING_TYPES):
             if emb_type in item1 and emb_type in item2:
                 scores[emb_type] = SimilarityService.cosine_similarity(
                     item1[emb_type], 
                     item2[emb_type]
                 )
-                used_weights[emb_type] = weight
+        
+        # Jika bobot tidak disediakan, gunakan fungsi bobot dinamis (skor clip_text dipakai ulang)
+        if weights is None:
+            weights = SimilarityService.compute_dynamic_weights(item1, item2, scores.get("clip_text"))
+        
+        used_weights = {emb_type: weights[emb_type] for emb_type in scores}
         
         # Hitung weighted average
         if not scores:
@@ -101,24 +106,96 @@ class SimilarityService:
             "weights_used": used_weights
         }
     
-    # Find and rank matches by similarity
+    # Indeks k skor tertinggi (urut menurun) dengan argpartition O(N), hanya k teratas yang diurutkan
+    @staticmethod
+    def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        if k <= 0 or len(scores) == 0:
+            return np.array([], dtype=np.intp)
+        if k < len(scores):
+            idx = np.argpartition(-scores, k - 1)[:k]
+        else:
+            idx = np.arange(len(scores))
+        return idx[np.argsort(-scores[idx], kind="stable")]
+    
+    # Susun embeddings kandidat menjadi matriks float32 (N x D) per tipe embedding beserta mask ketersediaannya
+    @staticmethod
+    def stack_embeddings(candidates: Union[Dict[str, Dict], Iterable[Tuple[str, Dict]]]) -> Dict:
+        ids = []
+        vectors = {emb_type: [] for emb_type in EMBEDDING_TYPES}
+        
+        # Terima dict atau iterator (item_id, data) agar dokumen bisa disusun langsung dari stream
+        items = candidates.items() if isinstance(candidates, dict) else candidates
+        for candidate_id, candidate_data in items:
+            ids.append(candidate_id)
+            # Dukung data dengan key 'embeddings' maupun embeddings langsung di dokumen
+            embeddings = candidate_data['embeddings'] if 'embeddings' in candidate_data else candidate_data
+            for emb_type in EMBEDDING_TYPES:
+                vectors[emb_type].append(embeddings.get(emb_type))
+        
+        modalities = {}
+        for emb_type, rows in vectors.items():
+            dims = [len(row) for row in rows if row is not None]
+            if not dims:
+                continue
+            
+            # Gunakan dimensi yang paling umum; baris dengan dimensi lain bernilai nol (similarity 0)
+            dim = max(set(dims), key=dims.count)
+            matrix = np.zeros((len(ids), dim), dtype=np.float32)
+            mask = np.zeros(len(ids), dtype=bool)
+            for i, row in enumerate(rows):
+                if row is None:
+                    continue
+                mask[i] = True
+                if len(row) == dim:
+                    matrix[i] = row
+            
+            modalities[emb_type] = (matrix, mask)
+        
+        return {
+            "ids": np.array(ids, dtype=object),
+            "modalities": modalities
+        }
+    
+    # Rata-rata dot product per tipe embedding untuk Q query x N kandidat, satu GEMM per tipe embedding
     @staticmethod
-    def rank_matches(query_item: Dict, candidates: Dict[str, Dict], threshold: float = 0.75, max_results: int = 10) ->List[Dict]:
-        matches = []
+    def average_similarity_batch(queries: List[Dict], stacked: Dict) -> Tuple[np.ndarray, np.ndarray, Dict]:
+        q, n = len(queries), len(stacked["ids"])
+        total = np.zeros((q, n), dtype=np.float32)
+        counts = np.zeros((q, n), dtype=np.int32)
+        components = {}
         
-        for candidate_id, candidate in candidates.items():
-            similarity = SimilarityService.calculate_hybrid_similarity(query_item, candidate)
+        for emb_type, (matrix, mask) in stacked["modalities"].items():
+            # Lewati tipe embedding yang tidak dimiliki query mana pun atau kandidat mana pun
+            query_mask = np.array([emb_type in query for query in queries], dtype=bool)
+            if not query_mask.any() or not mask.any():
+                continue
+            
+            # Query dengan dimensi berbeda tetap dihitung dengan similarity 0
+            query_matrix = np.zeros((q, matrix.shape[1]), dtype=np.float32)
+            for i, query in enumerate(queries):
+                if not query_mask[i]:
+                    continue
+                query_vec = np.asarray(query[emb_type], dtype=np.float32)
+                if query_vec.shape[0] != matrix.shape[1]:
+                    print(f"Warning: Dimension mismatch for {emb_type}. Query: {query_vec.shape[0]}, Candidates: {matrix.shape[1]}")
+                    continue
+                query_matrix[i] = query_vec
             
-            if similarity["total"] >= threshold:
-                matches.append({
-                    "id": candidate_id,
-                    "similarity": round(float(similarity["total"]), 4),
-                    "component_scores": {k: round(float(v), 4) for k, v in similarity["components"].items()},
-                    "match_type": "hybrid" if len(similarity["components"]) > 1 else list(similarity["components"].keys())[0]
-                })
-        
-        # Sort by similarity (descending)
-        matches.sort(key=lambda x: x["similarity"], reverse=True)
-        
-        # Limit results
-        return matches[:max_results]
\ No newline at end of file
+            pair_mask = query_mask[:, None] & mask[None, :]
+            
+            # Matriks float16 dinaikkan ke float32 agar perkalian tetap memakai BLAS; jika hanya
+            # sebagian kecil kandidat yang punya tipe ini, kalikan baris tersebut saja
+            present = np.flatnonzero(mask)
+            if len(present) * _SPARSE_MODALITY_RATIO < n:
+                sims = np.zeros((q, n), dtype=np.float32)
+                sims[:, present] = query_matrix @ matrix[present].astype(np.float32, copy=False).T
+                sims[~pair_mask] = 0.0
+            else:
+                sims = np.where(pair_mask, query_matrix @ matrix.astype(np.float32, copy=False).T, 0.0).astype(np.float32)
+            
+            total += sims
+            counts += pair_mask
+            components[emb_type] = (sims, pair_mask)
+        
+        scores = np.divide(total, counts, out=np.zeros_like(total), where=counts > 0)
+        return scores, counts, components
\ No newline at end of file
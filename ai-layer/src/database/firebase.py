@@ -1,20 +1,63 @@
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
+from google.api_core import exceptions as google_exceptions
+from google.api_core import retry
 import numpy as np
 import json
 import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from src.config import app_config
+
+# Normalisasi L2; vektor nol (fallback saat error) dibiarkan nol
+def _l2_normalize(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+# Ukuran satu WriteBatch (batas Firestore 500 operasi); batch yang lebih kecil di-commit paralel
+_WRITE_BATCH_SIZE = 50
+_WRITE_WORKERS = 10
+
+# Satu kebijakan retry untuk commit (menggantikan retry bawaan API, bukan ditumpuk di atasnya):
+# hanya error sementara yang dicoba ulang, dengan jeda eksponensial dan batas waktu total
+_COMMIT_RETRY = retry.Retry(
+    predicate=retry.if_exception_type(
+        google_exceptions.Aborted,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.ServiceUnavailable
+    ),
+    initial=0.2,
+    maximum=2.0,
+    multiplier=2.0,
+    timeout=30.0
+)
+_COMMIT_TIMEOUT = 30.0
+
+# Jumlah dokumen per halaman saat membaca koleksi
+_READ_PAGE_SIZE = 500
+
+# Tipe data embeddings yang disimpan sebagai Blob di Firestore
+_EMBEDDING_DTYPE = "float32"
 
 class FirebaseClient:
     _instance = None
+    _lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(FirebaseClient, cls).__new__(cls)
-            cls._instance.app = None
-            cls._instance.db = None
-            cls._instance._initialize_firebase()
+            # Lock agar inisialisasi dari beberapa thread hanya terjadi sekali
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(FirebaseClient, cls).__new__(cls)
+                    instance.app = None
+                    instance.db = None
+                    instance.collection_versions = {}
+                    instance._initialize_firebase()
+                    cls._instance = instance
         return cls._instance
     
     def _initialize_firebase(self):
@@ -38,93 +81,217 @@ class FirebaseClient:
     def is_connected(self):
         return self.db is not None
     
-    def save_embedding(self, collection_name, item_id, embeddings, metadata=None):
-        if not self.db:
-            print("Firebase not initialized")
-            return False
-        
+    # Tutup channel gRPC Firestore dan hapus app Firebase saat aplikasi berhenti
+    def close(self):
+        with self._lock:
+            try:
+                if self.db is not None:
+                    self.db.close()
+                if self.app is not None:
+                    firebase_admin.delete_app(self.app)
+            except Exception as e:
+                print(f"Error closing Firebase connection: {e}")
+            finally:
+                self.app = None
+                self.db = None
+    
+    # Versi koleksi naik setiap kali ada penulisan, dipakai untuk invalidasi cache embeddings
+    def get_collection_version(self, collection_name):
+        return self.collection_versions.get(collection_name, 0)
+    
+    def _bump_collection_version(self, collection_name):
+        with self._lock:
+            self.collection_versions[collection_name] = self.collection_versions.get(collection_name, 0) + 1
+    
+    def _build_document(self, item_id, embeddings, metadata=None):
         serializable_embeddings = {}
         
+        # Vektor dinormalisasi sekali saat disimpan sehingga similarity cukup dot product, lalu
+        # disimpan sebagai bytes float32 (Blob) yang ~5x lebih kecil dari list angka
         for key, value in embeddings.items():
-            if isinstance(value, np.ndarray):
-                serializable_embeddings[key] = value.tolist()
+            if isinstance(value, (np.ndarray, list)):
+                serializable_embeddings[key] = _l2_normalize(value).astype(_EMBEDDING_DTYPE).tobytes()
             else:
                 serializable_embeddings[key] = value
         
         document_data = {
             'item_id': item_id,
             'embeddings': serializable_embeddings,
+            'normalized': True,
+            'embedding_dtype': _EMBEDDING_DTYPE,
             'created_at': firestore.SERVER_TIMESTAMP
         }
         
         if metadata and isinstance(metadata, dict):
             document_data.update(metadata)
         
+        return document_data
+    
+    def save_embedding(self, collection_name, item_id, embeddings, metadata=None):
+        if not self.db:
+            print("Firebase not initialized")
+            return False
+        
+        document_data = self._build_document(item_id, embeddings, metadata)
+        
         try:
             self.db.collection(collection_name).document(item_id).set(document_data)
+            self._bump_collection_version(collection_name)
             print(f"Successfully saved embeddings for {item_id} to {collection_name}")
             return True
         except Exception as e:
             print(f"Error saving to Firebase: {e}")
             return False
     
+    # Simpan banyak dokumen dengan WriteBatch alih-alih satu RPC per dokumen; beberapa batch di-commit paralel
+    def save_embeddings_bulk(self, collection_name, items):
+        if not self.db:
+            print("Firebase not initialized")
+            return False
+        
+        items = list(items)
+        if not items:
+            return True
+        
+        try:
+            # Dokumen diserialisasi sekali di sini, thread pool hanya menjalankan commit
+            collection_ref = self.db.collection(collection_name)
+            batches = []
+            for start in range(0, len(items), _WRITE_BATCH_SIZE):
+                batch = self.db.batch()
+                for item_id, embeddings, metadata in items[start:start + _WRITE_BATCH_SIZE]:
+                    batch.set(collection_ref.document(item_id), self._build_document(item_id, embeddings, metadata))
+                batches.append(batch)
+            
+            if len(batches) == 1:
+                self._commit_batch(batches[0])
+            else:
+                with ThreadPoolExecutor(max_workers=min(_WRITE_WORKERS, len(batches))) as executor:
+                    list(executor.map(self._commit_batch, batches))
+            
+            self._bump_collection_version(collection_name)
+            print(f"Successfully saved embeddings for {len(items)} items to {collection_name}")
+            return True
+        except Exception as e:
+            # Commit yang sebagian berhasil tetap dianggap penulisan agar cache dimuat ulang
+            self._bump_collection_version(collection_name)
+            print(f"Error bulk saving to Firebase: {e}")
+            return False
+    
+    def _commit_batch(self, batch):
+        return batch.commit(retry=_COMMIT_RETRY, timeout=_COMMIT_TIMEOUT)
+    
+    # Ubah embeddings (Blob bytes atau list pada dokumen lama) menjadi numpy array;
+    # dokumen lama tanpa flag 'normalized' dinormalisasi di sini
+    def _load_embeddings(self, data):
+        if 'embeddings' not in data:
+            return
+        
+        normalized = data.get('normalized', False)
+        dtype = data.get('embedding_dtype', _EMBEDDING_DTYPE)
+        for key, value in data['embeddings'].items():
+            if isinstance(value, bytes):
+                data['embeddings'][key] = np.frombuffer(value, dtype=dtype)
+            elif isinstance(value, list):
+                # fromiter dengan dtype dan panjang tetap: tanpa inferensi tipe dan alokasi ulang
+                vector = np.fromiter(value, dtype=np.float32, count=len(value))
+                data['embeddings'][key] = vector if normalized else _l2_normalize(vector)
+    
     def get_embedding(self, collection_name, item_id):
         if not self.db:
             print("Firebase not initialized")
             return None
         
         try:
-            print(f"Trying to retrieve document: {collection_name}/{item_id}")
             doc = self.db.collection(collection_name).document(item_id).get()
             
             if not doc.exists:
                 print(f"No embedding found for {item_id} in {collection_name}")
                 return None
             
-            print(f"Document found for {item_id}")
             data = doc.to_dict()
             
-            # Debug output
-            print(f"Document data keys: {data.keys() if data else 'None'}")
-            
             # Convert back to numpy arrays if embeddings exist
-            if data and 'embeddings' in data:
-                for key, value in data['embeddings'].items():
-                    if isinstance(value, list):
-                        data['embeddings'][key] = np.array(value)
+            if data:
+                self._load_embeddings(data)
             
             return data
         except Exception as e:
-            print(f"Error retrieving from Firebase: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            print(f"Error retrieving from Firebase: {str(e)[:256]}")
+            if app_config.ENV == "development":
+                traceback.print_exc()
             return None
     
-    def get_all_embeddings(self, collection_name, limit=100):
+    # Ambil beberapa dokumen sekaligus dengan satu RPC get_all; hasil mengikuti urutan item_ids,
+    # item yang tidak ada bernilai None
+    def get_embeddings_bulk(self, collection_name, item_ids, fields=None):
         if not self.db:
             print("Firebase not initialized")
-            return {}
+            return [None] * len(item_ids)
         
         try:
-            docs = self.db.collection(collection_name).limit(limit).stream()
+            collection_ref = self.db.collection(collection_name)
+            refs = [collection_ref.document(item_id) for item_id in item_ids]
             
-            result = {}
-            for doc in docs:
+            found = {}
+            for doc in self.db.get_all(refs, field_paths=fields):
+                if not doc.exists:
+                    continue
                 data = doc.to_dict()
-                item_id = data.get('item_id', doc.id)
-                
-                if 'embeddings' in data:
-                    for key, value in data['embeddings'].items():
-                        if isinstance(value, list):
-                            data['embeddings'][key] = np.array(value)
-                
-                result[item_id] = data
+                self._load_embeddings(data)
+                found[doc.id] = data
             
-            return result
+            return [found.get(item_id) for item_id in item_ids]
+        except Exception as e:
+            print(f"Error retrieving from Firebase: {str(e)[:256]}")
+            if app_config.ENV == "development":
+                traceback.print_exc()
+            return [None] * len(item_ids)
+    
+    def get_all_embeddings(self, collection_name, limit=100, fields=None):
+        if not self.db:
+            print("Firebase not initialized")
+            return {}
+        
+        try:
+            return dict(self.iter_embeddings(collection_name, limit, fields))
         except Exception as e:
             print(f"Error retrieving from Firebase: {e}")
             return {}
     
+    # Hasilkan (item_id, data) satu per satu dari stream Firestore tanpa membangun dict seluruh koleksi;
+    # fields membatasi field yang dikirim server (projection), limit=None membaca seluruh koleksi.
+    # Dokumen diambil per halaman dengan cursor agar tidak ada satu stream besar yang tidak terbatas
+    def iter_embeddings(self, collection_name, limit=100, fields=None, page_size=_READ_PAGE_SIZE):
+        if not self.db:
+            print("Firebase not initialized")
+            return
+        
+        query = self.db.collection(collection_name).order_by('__name__')
+        if fields:
+            query = query.select(fields)
+        
+        remaining = limit
+        last_doc = None
+        while remaining is None or remaining > 0:
+            page_limit = page_size if remaining is None else min(page_size, remaining)
+            page_query = query.limit(page_limit)
+            if last_doc is not None:
+                page_query = page_query.start_after(last_doc)
+            
+            count = 0
+            for doc in page_query.stream():
+                count += 1
+                last_doc = doc
+                data = doc.to_dict()
+                self._load_embeddings(data)
+                yield data.get('item_id', doc.id), data
+            
+            if remaining is not None:
+                remaining -= count
+            if count < page_limit:
+                break
+    
     def delete_embedding(self, collection_name, item_id):
         if not self.db:
             print("Firebase not initialized")
@@ -132,13 +299,15 @@ class FirebaseClient:
         
         try:
             self.db.collection(collection_name).document(item_id).delete()
+            self._bump_collection_version(collection_name)
             print(f"Successfully deleted embedding for {item_id} from {collection_name}")
             return True
         except Exception as e:
             print(f"Error deleting from Firebase: {e}")
             return False
     
-    def search_embeddings(self, collection_name, filters=None, limit=50):
+    # fields membatasi field yang dikirim server, mis. tanpa embeddings bila hanya butuh metadata
+    def search_embeddings(self, collection_name, filters=None, limit=50, fields=None):
         if not self.db:
             print("Firebase not initialized")
             return {}
@@ -166,6 +335,9 @@ class FirebaseClient:
                         # Default to equality
                         query = query.where(field, '==', value)
             
+            if fields:
+                query = query.select(fields)
+            
             query = query.limit(limit)
             docs = query.stream()
             
@@ -174,10 +346,7 @@ class FirebaseClient:
                 data = doc.to_dict()
                 item_id = data.get('item_id', doc.id)
                 
-                if 'embeddings' in data:
-                    for key, value in data['embeddings'].items():
-                        if isinstance(value, list):
-                            data['embeddings'][key] = np.array(value)
+                self._load_embeddings(data)
                 
                 result[item_id] = data
             
@@ -1,5 +1,5 @@
 import redis
-import json
+import orjson
 import numpy as np
 import time
 import pickle
@@ -20,6 +20,8 @@ class RedisManager:
         self.ttl = redis_config.REDIS_TTL
         self.max_retries = 3
         self.retry_delay = 2 
+        self._stats_cache = None
+        self._stats_expires_at = 0.0
         
         self._connect_with_retry()
     
@@ -72,9 +74,9 @@ class RedisManager:
             if isinstance(value, np.ndarray):
                 # Serialize numpy array
                 value = pickle.dumps(value)
-            # Handle dictionaries and other objects
+            # Handle dictionaries and other objects (orjson langsung menangani tipe numpy)
             elif not isinstance(value, (bytes, str)):
-                value = json.dumps(value)
+                value = orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
             
             self.client.set(key, value)
             if expire:
@@ -110,8 +112,8 @@ class RedisManager:
             
             # Try to decode JSON
             try:
-                return json.loads(value)
-            except (TypeError, json.JSONDecodeError):
+                return orjson.loads(value)
+            except (TypeError, orjson.JSONDecodeError):
                 # Return as is if not JSON
                 return value
         except redis.RedisError as e:
@@ -151,19 +153,26 @@ class RedisManager:
         if not self.redis_available:
             return {"status": "unavailable"}
             
+        # Statistik INFO berubah lambat, cukup diambil ulang setelah TTL habis
+        now = time.monotonic()
+        if self._stats_cache is not None and self._stats_expires_at > now:
+            return self._stats_cache
+            
         try:
             info = self.client.info()
             memory_used = info.get("used_memory_human", "unknown")
             uptime = info.get("uptime_in_seconds", 0)
             connected_clients = info.get("connected_clients", 0)
             
-            return {
+            self._stats_cache = {
                 "status": "available",
                 "memory_used": memory_used,
                 "uptime_seconds": uptime,
                 "connected_clients": connected_clients,
                 "database": redis_config.REDIS_DB
             }
+            self._stats_expires_at = now + redis_config.REDIS_STATS_TTL
+            return self._stats_cache
         except Exception as e:
             print(f"Error getting Redis stats: {e}")
             return {"status": "error", "message": str(e)}
\ No newline at end of file
@@ -1,8 +1,64 @@
+import os
+
+# Konfigurasi allocator CUDA harus diset sebelum torch di-import
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:512")
+
+import asyncio
+from contextlib import asynccontextmanager
+import torch
 import uvicorn
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.config import app_config
 from src.api.routes import router as api_router
+from src.core.device import CUDA_AVAILABLE
+from src.core.models.clip_model import ClipModel
+from src.core.models.sentence_transformer import SentenceTransformerModel
+from src.database.firebase import FirebaseClient
+from src.database.redis_manager import RedisManager
+from src.core.services.embedding_index import EmbeddingIndex
+
+# Muat model dan panaskan allocator sebelum menerima request
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CUDA_AVAILABLE:
+        torch.cuda.set_per_process_memory_fraction(app_config.CUDA_MEMORY_FRACTION)
+        # TF32 tensor core untuk matmul/konvolusi float32 (Ampere+), dan autotuning kernel cuDNN
+        # karena ukuran input gambar selalu tetap 224x224
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        torch.backends.cudnn.benchmark = True
+
+    # Inisialisasi Firebase, Redis dan model secara bersamaan agar startup tidak berurutan
+    clip_model, sentence_transformer, _, _ = await asyncio.gather(
+        asyncio.to_thread(ClipModel),
+        asyncio.to_thread(SentenceTransformerModel),
+        asyncio.to_thread(FirebaseClient),
+        asyncio.to_thread(RedisManager)
+    )
+
+    try:
+        clip_model.warmup()
+        sentence_transformer.warmup()
+        print("Model warmup completed")
+    except Exception as e:
+        print(f"Error during model warmup: {e}")
+
+    # Muat matriks embeddings kedua koleksi di awal agar request pertama tidak membaca Firestore
+    try:
+        embedding_index = EmbeddingIndex()
+        await asyncio.gather(
+            asyncio.to_thread(embedding_index.get, "lost_items"),
+            asyncio.to_thread(embedding_index.get, "found_items")
+        )
+        print("Embedding index preloaded")
+    except Exception as e:
+        print(f"Error preloading embedding index: {e}")
+
+    yield
+
+    FirebaseClient().close()
 
 app = FastAPI(
     title=app_config.PROJECT_NAME,
@@ -10,13 +66,16 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  
+    allow_origins=app_config.CORS_ORIGINS,
+    allow_origin_regex=app_config.CORS_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -30,6 +89,9 @@ if __name__ == "__main__":
         "main:app",
         host=app_config.HOST,
         port=app_config.PORT,
-        reload=True,
+        reload=app_config.ENV == "development",
+        # "auto" memakai uvloop dan httptools bila terpasang (tidak tersedia di Windows)
+        loop="auto",
+        http="auto",
         log_level=app_config.LOG_LEVEL.lower()
     )
\ No newline at end of file
@@ -0,0 +1,56 @@
+import threading
+import time
+
+# Kumpulkan panggilan dari beberapa thread dalam jendela waktu singkat lalu proses dalam satu batch
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size=32, window=0.01):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._pending = []
+        self._condition = threading.Condition()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    # Blok sampai batch yang memuat item ini selesai diproses, lalu kembalikan hasil untuk item ini
+    def submit(self, item):
+        slot = {"item": item, "done": threading.Event(), "result": None, "error": None}
+        with self._condition:
+            self._pending.append(slot)
+            self._condition.notify()
+        
+        slot["done"].wait()
+        if slot["error"] is not None:
+            raise slot["error"]
+        return slot["result"]
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                
+                # Tunggu item lain sampai jendela habis atau batch penuh
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                
+                batch = self._pending[:self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size:]
+            
+            try:
+                results = list(self.batch_fn([slot["item"] for slot in batch]))
+                # Jumlah hasil harus sama dengan jumlah item; jika tidak, semua pemanggil menerima error
+                if len(results) != len(batch):
+                    raise ValueError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+                for slot, result in zip(batch, results):
+                    slot["result"] = result
+            except Exception as e:
+                for slot in batch:
+                    slot["error"] = e
+            finally:
+                for slot in batch:
+                    slot["done"].set()
@@ -1,8 +1,38 @@
 import hashlib
 import json
+import threading
+from collections import OrderedDict
 
 # Generate a deterministic cache key from data
 def generate_cache_key(prefix: str, data: dict) -> str:
     serialized = json.dumps(data, sort_keys=True)
     hash_value = hashlib.md5(serialized.encode()).hexdigest()
-    return f"{prefix}:{hash_value}"
\ No newline at end of file
+    return f"{prefix}:{hash_value}"
+
+# Cache LRU in-process yang aman dipakai dari beberapa thread
+class LRUCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
\ No newline at end of file
@@ -2,9 +2,62 @@ from PIL import Image, ImageOps, ImageEnhance, ImageFilter
 import numpy as np
 import cv2
 from io import BytesIO
+from functools import lru_cache
 import base64
+import re
 import requests
-from typing import Union, Tuple, List
+import requests.adapters
+from typing import Optional, Union, Tuple, List
+
+# Session bersama agar koneksi TLS ke Google Drive dipakai ulang antar unduhan (juga dari banyak thread)
+_http_session = requests.Session()
+_http_session.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+})
+_http_adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=64)
+_http_session.mount('http://', _http_adapter)
+_http_session.mount('https://', _http_adapter)
+
+# ID file Google Drive dari parameter id= pada URL
+_DRIVE_FILE_ID_RE = re.compile(r"id=([^&]*)")
+
+# Resolusi minimum hasil decode; cukup untuk deteksi objek sebelum di-resize ke 224x224
+_DECODE_MAX_SIZE = (1024, 1024)
+
+# Ubah URL view Google Drive menjadi URL unduhan langsung; URL yang sama sering berulang antar request
+@lru_cache(maxsize=4096)
+def _drive_download_url(image_url: str) -> Optional[str]:
+    if "drive.google.com" not in image_url or "export=view" not in image_url:
+        return None
+    
+    match = _DRIVE_FILE_ID_RE.search(image_url)
+    if not match:
+        return None
+    return f"https://drive.google.com/uc?id={match.group(1)}&export=download"
+
+# Unduh isi gambar dari URL (dengan penanganan khusus Google Drive)
+def fetch_image_bytes(image_url: str) -> bytes:
+    # Khusus untuk URL Google Drive
+    direct_url = _drive_download_url(image_url)
+    if direct_url:
+        print("Detected Google Drive URL, using special handling")
+        response = _http_session.get(direct_url, timeout=30)
+    else:
+        response = _http_session.get(image_url, timeout=30)
+    
+    response.raise_for_status()
+    return response.content
+
+# Decode bytes gambar ke RGB; JPEG besar di-decode langsung pada skala DCT 1/2..1/8 (draft)
+# selama hasilnya tetap >= _DECODE_MAX_SIZE, jauh lebih murah daripada decode penuh lalu resize
+def decode_image_bytes(content: bytes) -> Image.Image:
+    image = Image.open(BytesIO(content))
+    image.draft('RGB', _DECODE_MAX_SIZE)
+    return image.convert('RGB')
+
+# Gambar abu-abu pengganti saat gambar gagal dimuat
+def placeholder_image() -> Image.Image:
+    return Image.new('RGB', (224, 224), color=(128, 128, 128))
 
 def load_image(image_source: Union[str, bytes]) -> Image.Image:
     try:
@@ -13,31 +66,16 @@ def load_image(image_source: Union[str, bytes]) -> Image.Image:
                 print(f"Loading image from URL: {image_source}")
                 
                 try:
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                    }
-                    
-                    # Khusus untuk URL Google Drive
-                    if "drive.google.com" in image_source and "export=view" in image_source:
-                        print("Detected Google Drive URL, using special handling")
-                        # Ubah URL untuk mendapatkan akses langsung
-                        file_id = image_source.split("id=")[1].split("&")[0]
-                        direct_url = f"https://drive.google.com/uc?id={file_id}&export=download"
-                        response = requests.get(direct_url, timeout=30, headers=headers)
-                    else:
-                        response = requests.get(image_source, timeout=30, headers=headers)
-                    
-                    response.raise_for_status()
-                    img = Image.open(BytesIO(response.content))
+                    img = decode_image_bytes(fetch_image_bytes(image_source))
                     print(f"Successfully loaded image with size: {img.size}")
-                    return img.convert('RGB')
+                    return img
                 except Exception as e:
                     print(f"Error downloading image from URL: {str(e)}")
                     # Return placeholder gray image
-                    return Image.new('RGB', (224, 224), color=(128, 128, 128))
+                    return placeholder_image()
     except Exception as e:
         print(f"Critical error in load_image: {str(e)}")
-        return Image.new('RGB', (224, 224), color=(128, 128, 128))
+        return placeholder_image()
 
 # Tingkatkan kontras dan ketajaman gambar
 def enhance_image(image: Image.Image) -> Image.Image:
@@ -126,7 +164,7 @@ def normalize_image(image_array: np.ndarray) -> np.ndarray:
 # Pipeline preprocessing gambar dengan deteksi objek
 def process_image_with_object_detection(image: Image.Image, target_size: Tuple[int, int] = (224, 224)) -> Image.Image:
     try:
-        # Import object detector
+        # Import lokal: TensorFlow hanya dimuat saat deteksi objek benar-benar dipakai
         from src.core.models.object_detection import ObjectDetector
         detector = ObjectDetector()
         
@@ -0,0 +1,69 @@
+import threading
+import pytest
+from src.utils.batching import MicroBatcher
+
+def _submit_concurrently(batcher, items):
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    
+    def _run(i, item):
+        try:
+            results[i] = batcher.submit(item)
+        except Exception as e:
+            errors[i] = e
+    
+    threads = [threading.Thread(target=_run, args=(i, item)) for i, item in enumerate(items)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+def test_concurrent_submits_share_a_batch():
+    batches = []
+    
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+    
+    batcher = MicroBatcher(batch_fn, max_batch_size=32, window=0.2)
+    results, errors = _submit_concurrently(batcher, list(range(8)))
+    
+    assert results == [item * 2 for item in range(8)]
+    assert errors == [None] * 8
+    assert len(batches) < 8
+    assert sorted(item for batch in batches for item in batch) == list(range(8))
+
+def test_batches_respect_max_batch_size():
+    batches = []
+    
+    def batch_fn(items):
+        batches.append(list(items))
+        return items
+    
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, window=0.2)
+    results, _ = _submit_concurrently(batcher, list(range(10)))
+    
+    assert results == list(range(10))
+    assert all(len(batch) <= 3 for batch in batches)
+
+def test_batch_error_is_raised_to_every_caller():
+    def batch_fn(items):
+        raise ValueError("model failed")
+    
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, window=0.05)
+    _, errors = _submit_concurrently(batcher, list(range(4)))
+    assert all(isinstance(e, ValueError) for e in errors)
+    
+    with pytest.raises(ValueError):
+        batcher.submit(0)
+
+
+def test_result_count_mismatch_is_raised_to_every_caller():
+    def batch_fn(items):
+        return items[:-1]
+    
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, window=0.2)
+    results, errors = _submit_concurrently(batcher, list(range(4)))
+    assert results == [None] * 4
+    assert all(isinstance(e, ValueError) for e in errors)
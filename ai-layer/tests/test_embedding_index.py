@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from src.core.services import embedding_index
+from src.core.services.embedding_index import EmbeddingIndex
+
+# Pengganti FirebaseClient: dokumen disimpan di memori, versi koleksi naik setiap penulisan
+class StubFirebaseClient:
+    def __init__(self):
+        self.docs = {}
+        self.versions = {}
+        self.reads = 0
+    
+    def get_collection_version(self, collection_name):
+        return self.versions.get(collection_name, 0)
+    
+    def save(self, collection_name, item_id, embeddings):
+        self.docs.setdefault(collection_name, []).append((item_id, {"item_id": item_id, "embeddings": embeddings}))
+        self.versions[collection_name] = self.get_collection_version(collection_name) + 1
+    
+    # Default limit sama dengan FirebaseClient.iter_embeddings
+    def iter_embeddings(self, collection_name, limit=100, fields=None):
+        self.reads += 1
+        docs = self.docs.get(collection_name, [])
+        yield from (docs if limit is None else docs[:limit])
+
+def _embeddings(seed):
+    vector = np.random.default_rng(seed).standard_normal(8).astype(np.float32)
+    return {"clip_text": vector / np.linalg.norm(vector)}
+
+@pytest.fixture
+def firebase_client(monkeypatch):
+    client = StubFirebaseClient()
+    monkeypatch.setattr(embedding_index, "FirebaseClient", lambda: client)
+    monkeypatch.setattr(EmbeddingIndex, "_instance", None)
+    return client
+
+def _expire(index, collection_name):
+    index._collections[collection_name]["expires_at"] = 0.0
+
+def test_get_loads_whole_collection_and_keeps_upserts_after_reload(firebase_client):
+    for i in range(150):
+        firebase_client.save("found_items", f"item_{i:03d}", _embeddings(i))
+    
+    index = EmbeddingIndex()
+    assert len(index.get("found_items")["ids"]) == 150
+    
+    firebase_client.save("found_items", "item_new", _embeddings(999))
+    index.upsert("found_items", "item_new", _embeddings(999))
+    assert len(index.get("found_items")["ids"]) == 151
+    
+    _expire(index, "found_items")
+    stacked = index.get("found_items")
+    assert len(stacked["ids"]) == 151
+    assert "item_new" in stacked["ids"]
+
+
+def test_get_reuses_cache_until_version_changes(firebase_client):
+    firebase_client.save("lost_items", "item_a", _embeddings(1))
+    index = EmbeddingIndex()
+    
+    index.get("lost_items")
+    index.get("lost_items")
+    assert firebase_client.reads == 1
+    
+    # Penulisan tanpa upsert menaikkan versi sehingga koleksi dimuat ulang
+    firebase_client.save("lost_items", "item_b", _embeddings(2))
+    assert len(index.get("lost_items")["ids"]) == 2
+    assert firebase_client.reads == 2
+
+def test_get_reloads_after_ttl(firebase_client):
+    firebase_client.save("lost_items", "item_a", _embeddings(1))
+    index = EmbeddingIndex()
+    
+    index.get("lost_items")
+    _expire(index, "lost_items")
+    index.get("lost_items")
+    assert firebase_client.reads == 2
+
+def test_upsert_drops_cache_when_other_writes_happened(firebase_client):
+    firebase_client.save("lost_items", "item_a", _embeddings(1))
+    index = EmbeddingIndex()
+    index.get("lost_items")
+    
+    # Dua penulisan sejak cache dibuat: baris tidak ditambahkan, cache dibuang dan dimuat ulang
+    firebase_client.save("lost_items", "item_b", _embeddings(2))
+    firebase_client.save("lost_items", "item_c", _embeddings(3))
+    index.upsert("lost_items", "item_c", _embeddings(3))
+    assert "lost_items" not in index._collections
+    
+    assert len(index.get("lost_items")["ids"]) == 3
+    assert firebase_client.reads == 2
+
+def test_upsert_replaces_existing_row(firebase_client):
+    firebase_client.save("lost_items", "item_a", _embeddings(1))
+    index = EmbeddingIndex()
+    index.get("lost_items")
+    
+    firebase_client.save("lost_items", "item_a", _embeddings(5))
+    index.upsert("lost_items", "item_a", _embeddings(5))
+    stacked = index.get("lost_items")
+    matrix = stacked["modalities"]["clip_text"][0]
+    assert list(stacked["ids"]) == ["item_a"]
+    assert np.allclose(matrix[0], _embeddings(5)["clip_text"])
+    assert firebase_client.reads == 1
+
+def test_empty_collection_is_not_cached(firebase_client):
+    index = EmbeddingIndex()
+    assert len(index.get("lost_items")["ids"]) == 0
+    index.get("lost_items")
+    assert firebase_client.reads == 2
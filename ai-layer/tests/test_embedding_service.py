@@ -0,0 +1,39 @@
+import numpy as np
+from src.core.services import embedding_service
+from src.core.services.embedding_service import EmbeddingService
+
+_PLACEHOLDER_EMBEDDING = np.full(512, 0.5, dtype=np.float32)
+
+class StubCacheService:
+    def __init__(self):
+        self.stored = {}
+    
+    def get(self, key_type, identifier, **kwargs):
+        return self.stored.get((key_type, identifier))
+    
+    def set(self, key_type, identifier, value, expire=True):
+        self.stored[(key_type, identifier)] = value
+        return True
+
+class StubClipModel:
+    def get_image_embedding(self, image):
+        return _PLACEHOLDER_EMBEDDING
+    
+    def get_image_embedding_with_augmentation(self, image):
+        return _PLACEHOLDER_EMBEDDING
+
+def test_non_image_content_falls_back_to_placeholder_without_caching(monkeypatch):
+    content = b"<html><body>Google Drive can't scan this file for viruses.</body></html>"
+    monkeypatch.setattr(embedding_service, "fetch_image_bytes", lambda url: content)
+    
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.cache_service = StubCacheService()
+    service.clip_model = StubClipModel()
+    
+    image_url = "https://drive.google.com/uc?id=abc&export=view"
+    embedding = service.get_image_embedding_from_url(image_url, item_id="item_1")
+    
+    assert np.array_equal(embedding, _PLACEHOLDER_EMBEDDING)
+    assert service.cache_service.stored == {}
+    assert embedding_service._image_url_cache.get((image_url, True)) is None
+    assert len(embedding_service._image_content_cache) == 0
\ No newline at end of file
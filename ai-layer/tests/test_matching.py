@@ -9,6 +9,11 @@ def test_health():
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
+def test_live():
+    response = requests.get(f"{BASE_URL}/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
 def test_embedding_generation():
     # Test text embedding
     text_data = {
@@ -45,6 +50,8 @@ if __name__ == "__main__":
     print("Running tests...")
     test_health()
     print("✅ Health check passed")
+    test_live()
+    print("✅ Liveness check passed")
     test_embedding_generation()
     print("✅ Embedding generation passed")
     test_matching()
@@ -0,0 +1,64 @@
+import numpy as np
+from src.core.services.similarity_service import SimilarityService, EMBEDDING_TYPES
+
+def _unit(rng, dim):
+    vector = rng.standard_normal(dim)
+    return vector / np.linalg.norm(vector)
+
+# Perilaku loop lama: rata-rata cosine per tipe embedding yang dimiliki keduanya, dimensi berbeda bernilai 0
+def _reference(query, candidate):
+    sims = []
+    for emb_type in EMBEDDING_TYPES:
+        if emb_type in query and emb_type in candidate:
+            if len(query[emb_type]) == len(candidate[emb_type]):
+                sims.append(SimilarityService.cosine_similarity(query[emb_type], candidate[emb_type]))
+            else:
+                sims.append(0.0)
+    return (sum(sims) / len(sims) if sims else 0.0), len(sims)
+
+def _assert_matches_reference(queries, candidates):
+    stacked = SimilarityService.stack_embeddings(candidates)
+    scores, counts, _ = SimilarityService.average_similarity_batch(queries, stacked)
+    
+    for q, query in enumerate(queries):
+        for n, candidate_id in enumerate(stacked["ids"]):
+            expected_score, expected_count = _reference(query, candidates[candidate_id])
+            assert counts[q, n] == expected_count
+            assert abs(scores[q, n] - expected_score) < 1e-5
+
+def test_average_similarity_batch_dense_rows():
+    rng = np.random.default_rng(0)
+    candidates = {
+        f"item_{i}": {"clip_text": _unit(rng, 8), "sentence_text": _unit(rng, 6), "image": _unit(rng, 5)}
+        for i in range(10)
+    }
+    queries = [
+        {"clip_text": _unit(rng, 8), "sentence_text": _unit(rng, 6), "image": _unit(rng, 5)},
+        {"clip_text": _unit(rng, 8), "sentence_text": _unit(rng, 6)}
+    ]
+    _assert_matches_reference(queries, candidates)
+
+def test_average_similarity_batch_sparse_rows():
+    rng = np.random.default_rng(1)
+    candidates = {f"item_{i}": {"clip_text": _unit(rng, 8)} for i in range(12)}
+    # Hanya 2 dari 12 kandidat punya gambar, sehingga jalur perkalian baris jarang yang dipakai
+    candidates["item_3"]["image"] = _unit(rng, 5)
+    candidates["item_7"]["image"] = _unit(rng, 5)
+    candidates["item_9"] = {"image": _unit(rng, 5)}
+    queries = [
+        {"clip_text": _unit(rng, 8), "image": _unit(rng, 5)},
+        {"image": _unit(rng, 5)},
+        {"clip_text": _unit(rng, 8)}
+    ]
+    _assert_matches_reference(queries, candidates)
+
+def test_average_similarity_batch_dimension_mismatch_rows():
+    rng = np.random.default_rng(2)
+    candidates = {f"item_{i}": {"clip_text": _unit(rng, 8), "sentence_text": _unit(rng, 6)} for i in range(6)}
+    # Baris kandidat dengan dimensi minoritas dan query dengan dimensi berbeda sama-sama bernilai 0
+    candidates["item_2"]["clip_text"] = _unit(rng, 7)
+    queries = [
+        {"clip_text": _unit(rng, 8), "sentence_text": _unit(rng, 6)},
+        {"clip_text": _unit(rng, 9), "sentence_text": _unit(rng, 6)}
+    ]
+    _assert_matches_reference(queries, candidates)
\ No newline at end of file